@@ -15,6 +15,20 @@ import FreeCADGui as Gui
 import FreeCAD as App
 
 import libAsm4 as Asm4
+import configurationLib
+import interpolationLib
+
+
+
+"""
+    +-----------------------------------------------+
+    |                Global variables               |
+    +-----------------------------------------------+
+"""
+# the entry of the variables list that moves the assembly through all its
+# configurations, it can't be the name of a property
+CONFIGURATIONS = '[Configurations]'
+
 
 
 
@@ -41,7 +55,8 @@ class animateVariable():
 
     def IsActive(self):
         # is there an active document ?
-        if Asm4.checkModel() and App.ActiveDocument.getObject('Variables'):
+        if Asm4.checkModel() and ( App.ActiveDocument.getObject('Variables') \
+                                   or configurationLib.GetGroup('Configurations') ):
             return True
         return False 
 
@@ -58,16 +73,22 @@ class animateVariable():
         self.Variables = App.ActiveDocument.getObject('Variables')
         self.Model = App.ActiveDocument.getObject('Model')
         self.Run = True
+        # built when the configurations are selected
+        self.frames = None
 
         # Now we can draw the UI
         self.UI.show()
 
         # select the Float variables that are in the "Variables" group
         self.varList.clear()
-        for prop in self.Variables.PropertiesList:
-            if self.Variables.getGroupOfProperty(prop)=='Variables' :
-                if self.Variables.getTypeIdOfProperty(prop)=='App::PropertyFloat' :
-                    self.varList.addItem(prop)
+        if self.Variables:
+            for prop in self.Variables.PropertiesList:
+                if self.Variables.getGroupOfProperty(prop)=='Variables' :
+                    if self.Variables.getTypeIdOfProperty(prop)=='App::PropertyFloat' :
+                        self.varList.addItem(prop)
+        # interpolate between the saved configurations
+        if len(configurationLib.listConfigurations()) > 1:
+            self.varList.addItem(CONFIGURATIONS)
 
 
 
@@ -79,8 +100,15 @@ class animateVariable():
     def onSelectVar(self):
         # the currently selected variable
         selectedVar = self.varList.currentText()
+        # the configurations are read once, 0 is the first one, 1 the next one ...
+        if selectedVar == CONFIGURATIONS:
+            names = [ conf.Name for conf in configurationLib.listConfigurations() ]
+            self.frames = interpolationLib.configurationFrames( names, App.ActiveDocument )
+            self.minValue.setValue(0.0)
+            self.maxValue.setValue(len(names)-1)
+            self.stepValue.setValue(0.1)
         # if it's indeed a property in the Variables object (one never knows)
-        if selectedVar in self.Variables.PropertiesList:
+        elif self.Variables and selectedVar in self.Variables.PropertiesList:
             # get its value
             selectedVarValue = self.Variables.getPropertyByName(selectedVar)
             # initialise the Begin and End values with it
@@ -178,8 +206,12 @@ class animateVariable():
 
 
     def setVarValue(self,name,value):
-        setattr( self.Variables, name, value )
-        App.ActiveDocument.Model.recompute('True')
+        if name == CONFIGURATIONS:
+            # only the moving links are recomputed
+            self.frames.apply( value, Asm4.setViewVisibility )
+        else:
+            setattr( self.Variables, name, value )
+            App.ActiveDocument.Model.recompute('True')
         Gui.updateGui()
 
 
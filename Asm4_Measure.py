@@ -443,6 +443,8 @@ class selectionObserver():
         self.Sel2 = None
         self.Shp2 = None
         self.Pt2  = None
+        self.Src1 = None
+        self.Src2 = None
         PtS       = None
 
     def render_distance(self, distance: int) -> str:
@@ -488,11 +490,16 @@ class selectionObserver():
             #Faces or Edges
             if len(selEx[0].SubObjects)>0: 
                 subShape = selEx[0].SubObjects[0]
+                # where the shape comes from, for the geometry cache
+                subSource = None
+                if selEx[0].SubElementNames:
+                    subSource = ( selEx[0].Object, selEx[0].SubElementNames[0] )
                 # we have selected an LCS
                 if selObj.TypeId == 'PartDesign::CoordinateSystem':
                     base = selObj.Placement.Base
                     PtS  = self.drawPoint( App.Vector(base.x,base.y,base.z) )
                     subShape = PtS.Shape
+                    subSource = None
                 # if valid selection
                 if subShape.isValid() and ('Face' in str(subShape) or 'Edge' in str(subShape) or 'Vertex' in str(subShape)):
                     # clear the result area
@@ -508,6 +515,8 @@ class selectionObserver():
                         self.Sel2 = None
                         self.Shp2 = None
                         self.Pt2  = None
+                        self.Src1 = None
+                        self.Src2 = None
                         #taskUI.sel1Name.setText(str(subShape))
                         taskUI.sel1Name.setText(str(subShape).split(' ')[0][1:])
                         taskUI.sel2Name.clear()                        # shape selected
@@ -521,9 +530,10 @@ class selectionObserver():
                             else:
                                 self.Shp1 = subShape
                                 self.Sel1 = 'shape'
+                                self.Src1 = subSource
                         # Snap to select a point
                         elif taskUI.rbSnap.isChecked():
-                            self.Pt1 = self.getSnap(subShape)
+                            self.Pt1 = self.getSnap(subShape, subSource)
                             if self.Pt1:
                                 PtS  = self.drawPoint(self.Pt1)
                                 self.Sel1 = 'point'
@@ -536,7 +546,7 @@ class selectionObserver():
                             elif self.Sel1 == 'shape':
                                 # a surface
                                 if 'Face' in str(self.Shp1):
-                                    self.measureArea(self.Shp1)
+                                    self.measureArea(self.Shp1, self.Src1)
                                 # a point (should have been caught before)
                                 elif 'Vertex' in str(self.Shp1):
                                     self.measureCoords( self.Shp1 )
@@ -576,9 +586,10 @@ class selectionObserver():
                         if taskUI.rbShape.isChecked():
                             self.Sel2 = 'shape'
                             self.Shp2 = subShape
+                            self.Src2 = subSource
                         # Snap to select a point
                         elif taskUI.rbSnap.isChecked():
-                            self.Pt2 = self.getSnap(subShape)
+                            self.Pt2 = self.getSnap(subShape, subSource)
                             if self.Pt2:
                                 self.Sel2 = 'point'
                         # if we have a valid selection:
@@ -605,7 +616,7 @@ class selectionObserver():
                             # Measure angle
                             elif taskUI.rbAngle.isChecked():
                                 if self.Sel1=='shape' and self.Sel2=='shape':
-                                    self.angleShapes( self.Shp1, self.Shp2 )
+                                    self.angleShapes( self.Shp1, self.Shp2, self.Src1, self.Src2 )
                                 else:
                                     self.printResult( 'Select only faces or lines' )
                         # some problem
@@ -617,21 +628,23 @@ class selectionObserver():
 
 
     # uses BRepExtrema_DistShapeShape to calculate the distance between 2 shapes
-    def angleShapes( self, shape1, shape2 ):
+    def angleShapes( self, shape1, shape2, source1=None, source2=None ):
         global taskUI
         if shape1.isValid() and shape2.isValid():
             Gui.Selection.clearSelection()
             self.printResult( 'Measuring angles' )
+            bb1 = self.shapeProperty( shape1, 'BoundBox', source1 )
+            bb2 = self.shapeProperty( shape2, 'BoundBox', source2 )
             # Datum object
-            if shape1.BoundBox.DiagonalLength > 1e+10:
+            if bb1.DiagonalLength > 1e+10:
                 pt1 = shape1.Placement.Base
             else:
-                pt1 = shape1.BoundBox.Center
+                pt1 = bb1.Center
             # Datum object
-            if shape2.BoundBox.DiagonalLength > 1e+10:
+            if bb2.DiagonalLength > 1e+10:
                 pt2 = shape2.Placement.Base
             else:
-                pt2 = shape2.BoundBox.Center
+                pt2 = bb2.Center
             # get the direction of the shape
             dir1 = self.getDir(shape1)
             dir2 = self.getDir(shape2)
@@ -639,11 +652,13 @@ class selectionObserver():
                 distance = -1
                 angle = dir1.getAngle(dir2)*180./math.pi
                 # 2 flat faces
-                if self.isFlatFace(shape1) and self.isFlatFace(shape2):
+                flat1 = self.isFlatFace( shape1, source1 )
+                flat2 = self.isFlatFace( shape2, source2 )
+                if flat1 and flat2:
                     angle = 180 - angle
                 else:
                     # 1 flat face and 1 direction
-                    if self.isFlatFace(shape1) or self.isFlatFace(shape2):
+                    if flat1 or flat2:
                         angle = 90 - angle
                     if angle > 90:
                         angle = 180. - angle
@@ -788,7 +803,7 @@ class selectionObserver():
         return direction
 
     # figure out snap point of shape
-    def getSnap( self, shape ):
+    def getSnap( self, shape, source=None ):
         point = None
         if shape.isValid():
             if 'Vertex' in str(shape):
@@ -799,7 +814,7 @@ class selectionObserver():
                 point = shape.Curve.Center
             # as fall-back, snap to center of bounding box
             elif hasattr(shape,'BoundBox'):
-                point = shape.BoundBox.Center
+                point = self.shapeProperty( shape, 'BoundBox', source ).Center
         else:
             self.printResult('Invalid shape\n'+str(shape))
         return point
@@ -828,12 +843,15 @@ class selectionObserver():
                 self.drawAnnotation( point, anno )
 
 
-    def measureArea(self, face ):
+    # source is ( object, subName ) of the selected face, to use the
+    # cached values if the same face is measured again
+    def measureArea(self, face, source=None ):
         if face.isValid() and hasattr(face,'Area'):
-            if self.isFlatFace(face):
-                self.printResult('Flat face\nArea : '+str(face.Area)+'\n')
+            area = self.shapeProperty( face, 'Area', source )
+            if self.isFlatFace( face, source ):
+                self.printResult('Flat face\nArea : '+str(area)+'\n')
             else:
-                self.printResult('Area : '+str(face.Area)+"\n")
+                self.printResult('Area : '+str(area)+"\n")
         else:
             self.printResult('Not a valid surface\n'+str(face) )
 
@@ -985,14 +1003,21 @@ class selectionObserver():
             return True
         return False
 
-    def isFlatFace(self, shape):
+    def isFlatFace(self, shape, source=None):
         if shape.isValid()  and hasattr(shape,'Area')   \
-                            and shape.Area > 1.0e-6     \
+                            and self.shapeProperty( shape, 'Area', source ) > 1.0e-6 \
                             and hasattr(shape,'Volume') \
-                            and shape.Volume < 1.0e-9:
+                            and self.shapeProperty( shape, 'Volume', source ) < 1.0e-9:
             return True
         return False
 
+    # source is ( object, subName ) of a selected shape, to read the value
+    # from the geometry cache, else it's computed
+    def shapeProperty(self, shape, name, source=None):
+        if source:
+            return Asm4.getShapeProperty( source[0], name, source[1], shape )
+        return getattr( shape, name )
+
 
 
 
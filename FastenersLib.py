@@ -16,6 +16,8 @@ from FastenerBase import FSBaseObject
 import FastenersCmd as FS
 
 import libAsm4 as Asm4
+import selectionLib
+import profilerLib
 
 
 
@@ -98,28 +100,29 @@ class cloneFastenersToAxesCmd():
                 }
     
     def IsActive(self):
-        self.selection = getSelectedAxes()
-        if Asm4.checkModel() and self.selection:
+        if Asm4.checkModel() and selectionLib.cached( 'holeAxes', getSelectedAxes ):
             return True
         return False
 
     def Activated(self):
-        (fstnr, axes) = self.selection
+        (fstnr, axes) = selectionLib.cached( 'holeAxes', getSelectedAxes )
         if fstnr.Document:
-            for axisData in axes:
-                if len(axisData) > 3: # DocName/ModelName/AppLinkName/AxisName
-                    docName = axisData[0]
-                    doc = App.getDocument(docName)
-                    if doc:
-                        model = doc.getObject(axisData[1])
-                        if model:
-                            objLink = model.getObject(axisData[2])
-                            if objLink:
-                                obj = objLink.getLinkedObject()
-                                axis = obj.getObject(axisData[3])
-                                if axis and axis.Document:
-                                    newFstnr = Asm4.cloneObject(fstnr)
-                                    Asm4.placeObjectToLCS(newFstnr, axisData[2], axis.Document.Name, axisData[3])
+            # all the clones are recomputed once, at the end
+            with Asm4.deferredRecompute( fstnr.Document, 'Clone fasteners to axes' ):
+                for axisData in axes:
+                    if len(axisData) > 3: # DocName/ModelName/AppLinkName/AxisName
+                        docName = axisData[0]
+                        doc = App.getDocument(docName)
+                        if doc:
+                            model = doc.getObject(axisData[1])
+                            if model:
+                                objLink = model.getObject(axisData[2])
+                                if objLink:
+                                    obj = objLink.getLinkedObject()
+                                    axis = obj.getObject(axisData[3])
+                                    if axis and axis.Document:
+                                        newFstnr = Asm4.cloneObject(fstnr)
+                                        Asm4.placeObjectToLCS(newFstnr, axisData[2], axis.Document.Name, axisData[3])
                                     
             Gui.Selection.clearSelection()
             Gui.Selection.addSelection( fstnr.Document.Name, 'Model', fstnr.Name +'.')
@@ -141,7 +144,7 @@ class placeFastenerCmd():
                 }
 
     def IsActive(self):
-        if Asm4.checkModel() and getSelectionFS():
+        if Asm4.checkModel() and selectionLib.cached( 'fastener', getSelectionFS ):
             return True
         return False
 
@@ -302,7 +305,7 @@ class placeFastenerUI():
         # restore previous expression if it existed
         if self.old_EE != None:
             self.selectedFastener.setExpression('Placement', self.old_EE )
-        self.selectedFastener.recompute()
+        profilerLib.recompute( self.selectedFastener )
         # highlight the selected LCS in its new position
         Gui.Selection.clearSelection()
         Gui.Selection.addSelection( self.activeDoc.Name, 'Model', self.selectedFastener.Name +'.')
@@ -510,7 +513,7 @@ class placeFastenerUI():
         oldRotation  = self.selectedFastener.AttachmentOffset.Rotation
         newRotation  = oldRotation.multiply( addRotation )
         self.selectedFastener.AttachmentOffset.Rotation = newRotation
-        self.selectedFastener.recompute()
+        profilerLib.recompute( self.selectedFastener )
 
     def onRotX(self):
         # return is a Placement extract the Rotation of it
@@ -528,7 +531,7 @@ class placeFastenerUI():
         y = self.YtranslSpinBox.value()
         z = self.ZtranslSpinBox.value()
         self.selectedFastener.AttachmentOffset.Base = App.Vector(x,y,z)
-        self.selectedFastener.recompute()
+        profilerLib.recompute( self.selectedFastener )
 
     # fill in the GUI
     def initUI(self):
@@ -692,7 +695,7 @@ class insertFastener:
                 "Pixmap" : self.icon }
 
     def IsActive(self):
-        if App.ActiveDocument and  self.getPart():
+        if App.ActiveDocument and selectionLib.cached( 'fastenerPart', self.getPart ):
                 return True
         return(None)
 
@@ -773,7 +776,7 @@ class changeFSparametersCmd():
                 }
 
     def IsActive(self):
-        if App.ActiveDocument and getSelectionFS():
+        if App.ActiveDocument and selectionLib.cached( 'fastener', getSelectionFS ):
             return True
         return False
 
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# batchLib.py
+#
+# processes many .FCStd files without the GUI, each file in its own
+# FreeCADCmd process, as many processes in parallel as there are cores
+#
+# usage, to update all the assemblies in some directories:
+#   python3 batchLib.py [-j 8] [--report report.csv] dir1 dir2 file.FCStd ...
+# to export their BOM, next to each file:
+#   python3 batchLib.py --bom csv [--flat] dir1 dir2 ...
+# or, faster, without opening them in FreeCAD:
+#   python3 batchLib.py --bom csv --structure [--geometry] dir1 dir2 ...
+# to compare the BOM of two revisions, or of two configurations:
+#   python3 batchLib.py --diff old/asm.FCStd asm.FCStd
+#   python3 batchLib.py --diff asm.FCStd --configurations shipping service
+# to write a variant of each file for some saved configurations:
+#   python3 batchLib.py --apply --configurations shipping service [--format step] dir1 ...
+# or, when FreeCADCmd is the only Python with FreeCAD:
+#   ASM4_BATCH_PATHS="dir1:dir2" FreeCADCmd batchLib.py
+#
+# each worker is FreeCADCmd running this same file: the job is passed in
+# the ASM4_BATCH_JOB environment variable, and the worker writes its
+# result as JSON in the file given by ASM4_BATCH_RESULT
+
+
+
+import os, sys, time, json, csv, shutil, tempfile, subprocess, traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# the FreeCAD modules are only needed in the workers, they're imported there
+
+
+
+"""
+    +-----------------------------------------------+
+    |                Global variables               |
+    +-----------------------------------------------+
+"""
+jobVariable    = 'ASM4_BATCH_JOB'
+resultVariable = 'ASM4_BATCH_RESULT'
+pathsVariable  = 'ASM4_BATCH_PATHS'
+
+# the FreeCADCmd executable can be given explicitly
+commandVariable = 'ASM4_FREECADCMD'
+commandNames    = [ 'FreeCADCmd', 'freecadcmd', 'FreeCADCmd.exe' ]
+
+# seconds between two checks of the cancel flag while a worker runs
+pollInterval = 0.2
+
+# the tasks the workers know, by name. Tasks of other modules are given
+# as 'module.function', the module is imported by the worker
+tasks = {}
+
+reportFields = [ 'file', 'status', 'seconds', 'workerSeconds', 'recomputed', 'message' ]
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                  Master side                  |
+    +-----------------------------------------------+
+"""
+# all the .FCStd files in the given files and directories, recursively
+def findFiles( paths ):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for ( root, dirs, names ) in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    if name.lower().endswith('.fcstd'):
+                        files.append( os.path.join(root, name) )
+        elif path.lower().endswith('.fcstd'):
+            files.append(path)
+    return files
+
+
+def findFreeCADCmd():
+    command = os.environ.get(commandVariable)
+    if command:
+        return command
+    for name in commandNames:
+        command = shutil.which(name)
+        if command:
+            return command
+    # next to the FreeCAD we're running in, also when it's the GUI
+    if 'FreeCAD' in sys.modules:
+        binPath = os.path.join( sys.modules['FreeCAD'].getHomePath(), 'bin' )
+        for name in commandNames:
+            command = os.path.join( binPath, name )
+            if os.path.isfile(command):
+                return command
+    # we're probably running inside FreeCADCmd itself, but the GUI can't be a worker
+    if not getattr( sys.modules.get('FreeCAD'), 'GuiUp', False ):
+        return sys.executable
+    raise FileNotFoundError( 'FreeCADCmd not found, set '+commandVariable+' to its path' )
+
+
+# runs one job in a FreeCADCmd process, and returns its result dict.
+# The worker is killed if cancel, a threading.Event, is set
+def runJob( job, script, command, timeout=None, cancel=None ):
+    result = { 'file': job.get('file',''), 'status': 'error', 'message': '' }
+    if cancel is not None and cancel.is_set():
+        result['status'] = 'cancelled'
+        return result
+    ( handle, resultFile ) = tempfile.mkstemp( prefix='asm4_', suffix='.json' )
+    os.close(handle)
+    env = dict(os.environ)
+    env[jobVariable]    = json.dumps(job)
+    env[resultVariable] = resultFile
+    start = time.time()
+    try:
+        process = subprocess.Popen( [ command, script ], env=env, \
+                                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT, \
+                                    universal_newlines=True )
+        output = waitProcess( process, timeout, cancel )
+        if output is None:
+            result['status'] = 'cancelled'
+        else:
+            try:
+                with open(resultFile) as f:
+                    result.update( json.load(f) )
+            except ValueError:
+                # the worker crashed before writing its result
+                lines = [ l for l in output.splitlines() if l.strip() ]
+                result['message'] = 'worker exited with code '+str(process.returncode)
+                if lines:
+                    result['message'] += ': '+lines[-1]
+    except subprocess.TimeoutExpired:
+        result['message'] = 'timeout after '+str(timeout)+' s'
+    except OSError as e:
+        result['message'] = 'cannot start '+command+': '+str(e)
+    finally:
+        os.remove(resultFile)
+    result['seconds'] = round( time.time() - start, 3 )
+    return result
+
+
+# the output of the process when it's finished, or None if it was cancelled
+def waitProcess( process, timeout=None, cancel=None ):
+    start = time.time()
+    while True:
+        try:
+            return process.communicate( timeout=pollInterval )[0]
+        except subprocess.TimeoutExpired:
+            cancelled = cancel is not None and cancel.is_set()
+            if cancelled or ( timeout and time.time()-start > timeout ):
+                process.kill()
+                process.communicate()
+                if cancelled:
+                    return None
+                raise
+
+
+# runs all the jobs with one FreeCADCmd process per core. progress is
+# called with ( result, done, total ) as the jobs finish
+def runJobs( jobs, script=None, workers=None, command=None, timeout=None, progress=None, cancel=None ):
+    script  = script  or os.path.abspath(__file__)
+    command = command or findFreeCADCmd()
+    workers = workers or os.cpu_count() or 1
+    results = [None] * len(jobs)
+    with ThreadPoolExecutor( max_workers=workers ) as pool:
+        futures = { pool.submit( runJob, job, script, command, timeout, cancel ): i \
+                    for i, job in enumerate(jobs) }
+        done = 0
+        for future in as_completed(futures):
+            results[ futures[future] ] = future.result()
+            done += 1
+            if progress:
+                progress( results[futures[future]], done, len(jobs) )
+    return results
+
+
+def updateFiles( paths, workers=None, command=None, timeout=None, progress=None ):
+    jobs = [ { 'task': 'update', 'file': os.path.abspath(f) } for f in findFiles(paths) ]
+    return runJobs( jobs, workers=workers, command=command, timeout=timeout, progress=progress )
+
+
+# the BOM of each file is written next to it, as file.bom.csv or file.bom.jsonl
+# With structure, the files aren't opened but read directly, and the size
+# and volume of the parts are only read with geometry
+def exportBOMs( paths, format='csv', flat=False, workers=None, command=None, timeout=None, progress=None, \
+                structure=False, geometry=False ):
+    jobs = [ { 'task': 'bomLib.bomTask', 'file': os.path.abspath(f), 'format': format, 'flat': flat, \
+               'structure': structure, 'geometry': geometry } for f in findFiles(paths) ]
+    return runJobs( jobs, workers=workers, command=command, timeout=timeout, progress=progress )
+
+
+# a variant of each file for each configuration, see configurationLib.
+# fileFormat is FCStd, or an export format like step
+def applyConfigurations( paths, configurations=(), fileFormat='FCStd', output=None, \
+                         workers=None, command=None, timeout=None, progress=None ):
+    if output:
+        output = os.path.abspath(output)
+    jobs = [ { 'task': 'configurationLib.variantTask', 'file': os.path.abspath(f), \
+               'configurations': list(configurations), 'format': fileFormat, 'output': output } \
+             for f in findFiles(paths) ]
+    return runJobs( jobs, workers=workers, command=command, timeout=timeout, progress=progress )
+
+
+# compares the BOM of two files, or of two configurations of one file,
+# in one worker. The differences are in result['diff']
+def diffBOMs( before, after=None, configurations=(), command=None, timeout=None ):
+    job = { 'task': 'bomLib.diffTask', 'file': os.path.abspath(before), \
+            'other': os.path.abspath( after or before ) }
+    if configurations:
+        job['configuration']      = configurations[0]
+        job['otherConfiguration'] = configurations[-1]
+    return runJobs( [ job ], command=command, timeout=timeout )[0]
+
+
+def printDiff( diff, out=sys.stdout ):
+    signs = { 'added': '+', 'removed': '-', 'changed': '~' }
+    for row in diff:
+        name = row['document']+'#'+row['label'] if row['document'] else row['label']
+        out.write( signs[row['change']]+' '+name+': '+str(row['before'])+' -> '+str(row['after'])+'\n' )
+    out.write( str(len(diff))+' differences\n' )
+
+
+def printReport( results, out=sys.stdout ):
+    width = max( [ len(r['file']) for r in results ] + [4] )
+    out.write( 'File'.ljust(width)+'  Status  Seconds  Recomputed  Message\n' )
+    for r in results:
+        out.write( r['file'].ljust(width)+'  '+r['status'].ljust(6)+'  ' \
+                   +('%7.2f' % r.get('seconds',0))+'  ' \
+                   +str(r.get('recomputed','')).rjust(10)+'  '+r.get('message','')+'\n' )
+    failed = len( [ r for r in results if r['status'] != 'ok' ] )
+    total  = sum( [ r.get('seconds',0) for r in results ] )
+    out.write( str(len(results))+' files, '+str(failed)+' failed, ' \
+               +('%.1f' % total)+' s of worker time\n' )
+
+
+def writeReport( results, fileName ):
+    with open( fileName, 'w', newline='' ) as f:
+        writer = csv.DictWriter( f, fieldnames=reportFields, extrasaction='ignore' )
+        writer.writeheader()
+        for r in results:
+            writer.writerow(r)
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                  Worker side                  |
+    +-----------------------------------------------+
+"""
+# opens a document, and closes it and the documents it loaded afterwards
+def openDocument( fileName ):
+    import FreeCAD as App
+    before = set( App.listDocuments().keys() )
+    doc = App.openDocument( fileName )
+    loaded = [ name for name in App.listDocuments() if name not in before ]
+    return ( doc, loaded )
+
+
+def closeDocuments( names ):
+    import FreeCAD as App
+    for name in names:
+        if name in App.listDocuments():
+            App.closeDocument(name)
+
+
+# same as the Asm4_updateAssembly command, then save
+def updateTask( job ):
+    import solverLib
+    result = {}
+    ( doc, loaded ) = openDocument( job['file'] )
+    try:
+        recomputed = solverLib.updateAssembly( doc, incremental=False )
+        if recomputed is None:
+            result['status']  = 'error'
+            result['message'] = '; '.join( solverLib.checkAssembly(doc) )
+        else:
+            doc.save()
+            result['status']     = 'ok'
+            result['recomputed'] = len(recomputed)
+            result['message']    = '; '.join( solverLib.assemblyWarnings(doc) )
+    finally:
+        closeDocuments( loaded )
+    return result
+
+tasks['update'] = updateTask
+
+
+def getTask( name ):
+    if name in tasks:
+        return tasks[name]
+    import importlib
+    ( moduleName, functionName ) = name.rsplit('.',1)
+    return getattr( importlib.import_module(moduleName), functionName )
+
+
+def runWorker( job, resultFile ):
+    start = time.time()
+    try:
+        result = getTask( job['task'] )( job )
+    except Exception as e:
+        result = { 'status': 'error', 'message': repr(e) }
+        traceback.print_exc()
+    result['workerSeconds'] = round( time.time() - start, 3 )
+    with open( resultFile, 'w' ) as f:
+        json.dump( result, f )
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                  Entry point                  |
+    +-----------------------------------------------+
+"""
+def main( argv ):
+    import argparse
+    parser = argparse.ArgumentParser( description='Update Assembly4 assemblies, or export their BOM, without the GUI' )
+    parser.add_argument( 'paths', nargs='*', help='.FCStd files or directories' )
+    parser.add_argument( '-j', '--jobs', type=int, default=None, help='number of parallel workers' )
+    parser.add_argument( '--timeout', type=float, default=None, help='seconds allowed per file' )
+    parser.add_argument( '--freecadcmd', default=None, help='the FreeCADCmd executable' )
+    parser.add_argument( '--report', default=None, help='write the report to this CSV file' )
+    parser.add_argument( '--bom', choices=['csv','tsv','json','jsonl'], default=None, \
+                         help='export the BOM of the files instead of updating them' )
+    parser.add_argument( '--flat', action='store_true', help='flat BOM, total quantity per part' )
+    parser.add_argument( '--structure', action='store_true', \
+                         help='read the BOM from the files without opening them in FreeCAD' )
+    parser.add_argument( '--geometry', action='store_true', \
+                         help='with --structure, also read the size and volume of the parts' )
+    parser.add_argument( '--diff', action='store_true', \
+                         help='compare the BOM of two files, or of two configurations of one file' )
+    parser.add_argument( '--configurations', nargs='+', default=[], \
+                         help='with --diff, the configuration of the first and second file; ' \
+                             +'with --apply, the configurations to apply (default all)' )
+    parser.add_argument( '--apply', action='store_true', \
+                         help='write a variant of each file for each configuration' )
+    parser.add_argument( '--format', default='FCStd', help='with --apply, FCStd or an export format like step' )
+    parser.add_argument( '--output', default=None, help='with --apply, the directory of the variants' )
+    args = parser.parse_args( argv )
+    paths = args.paths
+    if not paths and os.environ.get(pathsVariable):
+        paths = os.environ[pathsVariable].split(os.pathsep)
+    def progress( result, done, total ):
+        sys.stdout.write( '['+str(done)+'/'+str(total)+'] '+result['status']+' '+result['file']+'\n' )
+        sys.stdout.flush()
+    if args.diff:
+        if len(paths) not in (1,2) or ( len(paths) == 1 and len(args.configurations) != 2 ):
+            parser.error( '--diff needs two files, or one file and two configurations' )
+        result = diffBOMs( paths[0], paths[-1], args.configurations, args.freecadcmd, args.timeout )
+        if result['status'] != 'ok':
+            sys.stderr.write( result['message']+'\n' )
+            return 1
+        printDiff( result['diff'] )
+        return 0
+    if args.apply:
+        results = applyConfigurations( paths, args.configurations, args.format, args.output, \
+                                       args.jobs, args.freecadcmd, args.timeout, progress )
+    elif args.bom:
+        results = exportBOMs( paths, args.bom, args.flat, args.jobs, args.freecadcmd, args.timeout, progress, \
+                              args.structure, args.geometry )
+    else:
+        results = updateFiles( paths, args.jobs, args.freecadcmd, args.timeout, progress )
+    printReport( results )
+    if args.report:
+        writeReport( results, args.report )
+    return 0 if all( r['status'] == 'ok' for r in results ) else 1
+
+
+
+if __name__ == '__main__':
+    if os.environ.get(jobVariable) and os.environ.get(resultVariable):
+        # the workers need the other Asm4 modules
+        sys.path.insert( 0, os.path.dirname(os.path.abspath(__file__)) )
+        runWorker( json.loads(os.environ[jobVariable]), os.environ[resultVariable] )
+    # FreeCADCmd passes its own arguments, so they aren't ours
+    elif os.path.basename(sys.executable).lower().startswith('freecadcmd'):
+        main( [] )
+    else:
+        sys.exit( main( sys.argv[1:] ) )
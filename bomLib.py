@@ -0,0 +1,782 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# bomLib.py
+#
+# builds the Bill Of Materials of an Assembly4 Model: identical parts are
+# counted together, per parent assembly and for the whole Model, and the
+# data of each part (size, volume, PartInfo) is read only once
+#
+# usage:
+#   bom = bomLib.bomTable( App.ActiveDocument.Model )
+#   for row in bom.treeRows():    # indented BOM, quantities per parent
+#   for row in bom.flatRows():    # one row per part, total quantities
+#
+# the table can follow the changes of the documents, and only the changed
+# assemblies and parts are read again:
+#   bom.follow()
+#   if bom.refresh():                 # something changed
+#
+# the rows can be written, as they are produced, to CSV, JSON, JSON Lines
+# or a Spreadsheet in the document:
+#   bomLib.exportBOM( model, '/tmp/bom.csv' )
+#
+# the BOM of a file can also be read without opening it and the files it
+# links to, the size and volume of the parts are then optional:
+#   bom = bomLib.fileBomTable( 'asm.FCStd', geometry=False )
+#
+# two BOMs, of two configurations or two files, can be compared:
+#   bomLib.diffConfigurations( model, 'shipping', 'service' )
+#   bomLib.diffFiles( 'old/asm.FCStd', 'asm.FCStd' )
+#
+# this file doesn't import any GUI module, so that it can also be used
+# from FreeCADCmd
+
+
+
+import os, csv, json
+
+import FreeCAD as App
+
+import cacheLib
+import coreLib
+import configurationLib
+import fcstdLib
+
+
+
+"""
+    +-----------------------------------------------+
+    |                Global variables               |
+    +-----------------------------------------------+
+"""
+# the columns of the rows, and their titles
+fields = [ 'level', 'quantity', 'total', 'document', 'name', 'label', 'description', \
+           'type', 'xLength', 'yLength', 'zLength', 'volume', 'area', 'centerOfMass', \
+           'inertia' ] + coreLib.partInfo
+
+titles = [ 'Level', 'Qty', 'Total', 'Document', 'Name', 'Label', 'Description', \
+           'Type', 'X', 'Y', 'Z', 'Volume', 'Area', 'Center of mass', \
+           'Inertia' ] + coreLib.partInfo
+
+# changing these properties of an object changes what an assembly contains
+structureProperties = [ 'Group', 'LinkedObject' ]
+
+# changing these properties of a part changes its row
+partProperties = [ 'Label', 'Label2', 'Shape' ] + coreLib.partInfo
+
+# these are not parts
+ignoredTypes = coreLib.datumTypes + [ 'Sketcher::SketchObject', 'Spreadsheet::Sheet', \
+                                      'App::DocumentObjectGroup', 'App::Origin' ]
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |           which objects are BOM items         |
+    +-----------------------------------------------+
+"""
+# App::Part containers are sub-assemblies, their content is listed too.
+# Groups are only folders, their content belongs to the container, so
+# each assembly is walked down to its groups
+def isFolder( obj, linkedObj, depth ):
+    return depth == 0 or linkedObj.TypeId == 'App::DocumentObjectGroup'
+
+
+def isItem( obj, linkedObj, depth ):
+    if linkedObj.TypeId in ignoredTypes or linkedObj.Name == 'Variables':
+        return False
+    return linkedObj.TypeId == 'App::Part' or hasattr( linkedObj, 'Shape' )
+
+
+def partKey( obj ):
+    return ( obj.Document.Name, obj.Name )
+
+
+def getObject( key ):
+    doc = App.listDocuments().get( key[0] )
+    return doc.getObject( key[1] ) if doc else None
+
+
+# the ( name, value ) of the Variables of an assembly
+def getVariables( obj ):
+    if obj.TypeId != 'App::Part' or 'Variables.' not in obj.getSubObjects(1):
+        return []
+    variables = obj.Document.getObject( 'Variables' )
+    # not read from the files, see fileBomTable
+    if not hasattr( variables, 'PropertiesList' ):
+        return []
+    return [ ( prop, str( variables.getPropertyByName(prop) ) ) for prop in variables.PropertiesList \
+             if variables.getGroupOfProperty(prop) == 'Variables' ]
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                 the BOM itself                |
+    +-----------------------------------------------+
+"""
+class bomTable():
+    # if volumes is False, only the size of the parts is read here, and the
+    # mass properties of the parts in staleMass are computed later in
+    # parallel, see massLib. Parts read again by refresh() go back there.
+    # accept(obj) tells whether an instance is counted, see configurationFilter
+    def __init__( self, model, volumes=True, accept=None ):
+        self.model = model
+        self.root = partKey(model)
+        self.volumes = volumes
+        self.accept = accept
+        # part key -> data of that part, read once
+        self.parts = {}
+        # part key -> { child part key: quantity in that part }, in tree order
+        self.children = {}
+        # part key -> { child part key: labels of the links to it }
+        self.labels = {}
+        # assembly key -> ( name, value ) of its Variables
+        self.variables = {}
+        # assembly key -> keys of the objects counted in it, and the reverse
+        self.members = {}
+        self.instances = {}
+        # what the document changes made obsolete, see refresh()
+        self.dirtyParts = set()
+        self.dirtyAssemblies = set()
+        self.rebuild = False
+        self.valid = True
+        # part keys without their mass properties
+        self.staleMass = set()
+        self.build()
+
+
+    # walks the tree once, expanding each sub-assembly only once: the cost
+    # depends on the number of different parts, not on the number of instances
+    def build( self ):
+        self.dirtyParts = set()
+        self.dirtyAssemblies = set()
+        self.parts = {}
+        self.children = {}
+        self.labels = {}
+        self.variables = {}
+        self.members = {}
+        self.instances = {}
+        self.staleMass = set()
+        self.addPart( self.model )
+        self.expand( [ self.model ] )
+
+
+    # counts the content of the given assemblies, and of the sub-assemblies
+    # found there that aren't known yet
+    def expand( self, assemblies ):
+        while assemblies:
+            assembly = assemblies.pop()
+            key = partKey(assembly)
+            for member in self.members.pop( key, () ):
+                self.instances.pop( member, None )
+            quantities = {}
+            labels = {}
+            members = []
+            for ( path, obj, linkedObj, depth, plc ) in coreLib.walkTree( assembly, descend=isFolder ):
+                if depth == 0:
+                    continue
+                # also the groups, their content changes the assembly
+                members.append( partKey(obj) )
+                if not isItem( obj, linkedObj, depth ):
+                    continue
+                if self.accept and not self.accept(obj):
+                    continue
+                child = partKey(linkedObj)
+                quantities[child] = quantities.get( child, 0 ) + 1
+                if obj is not linkedObj:
+                    labels.setdefault( child, [] ).append( obj.Label )
+                if child not in self.parts:
+                    self.addPart( linkedObj )
+                    if linkedObj.TypeId == 'App::Part':
+                        assemblies.append( linkedObj )
+            self.members[key] = members
+            for member in members:
+                self.instances[member] = key
+            if quantities:
+                self.children[key] = quantities
+            else:
+                self.children.pop( key, None )
+            self.labels[key] = labels
+
+
+    def addPart( self, obj ):
+        data = { 'document': obj.Document.Name, 'name': obj.Name, 'label': obj.Label, \
+                 'description': obj.Label2, 'type': obj.TypeId }
+        data.update( self.getGeometry(obj) )
+        for info in coreLib.partInfo:
+            data[info] = getattr( obj, info, '' )
+        self.parts[ partKey(obj) ] = data
+        variables = getVariables(obj)
+        if variables:
+            self.variables[ partKey(obj) ] = variables
+        else:
+            self.variables.pop( partKey(obj), None )
+        if not self.volumes:
+            self.staleMass.add( partKey(obj) )
+
+
+    def getGeometry( self, obj ):
+        return getGeometry( obj, self.volumes )
+
+
+    # total quantity of each part in the whole Model
+    def totals( self ):
+        totals = { self.root: 1 }
+        for key in self.order():
+            for child, quantity in self.children.get( key, {} ).items():
+                totals[child] = totals.get( child, 0 ) + totals[key] * quantity
+        return totals
+
+
+    # the parts, each after all the assemblies using it
+    def order( self ):
+        users = {}
+        for key, quantities in self.children.items():
+            for child in quantities:
+                users[child] = users.get( child, 0 ) + 1
+        ordered = []
+        ready = [ self.root ]
+        while ready:
+            key = ready.pop()
+            ordered.append( key )
+            for child in self.children.get( key, {} ):
+                users[child] -= 1
+                if users[child] == 0:
+                    ready.append( child )
+        return ordered
+
+
+    # indented BOM: each part under each of its assemblies, with the
+    # quantity in that assembly and the total quantity at that place
+    def treeRows( self ):
+        branches = [ iter( [ (self.root, 1, 0, 1) ] ) ]
+        while branches:
+            item = next( branches[-1], None )
+            if item is None:
+                branches.pop()
+                continue
+            ( key, quantity, level, total ) = item
+            yield self.makeRow( key, level, quantity, total )
+            children = self.children.get(key)
+            if children:
+                branches.append( iterChildren( children, level+1, total ) )
+
+
+    # flat BOM: each part once, with its total quantity
+    def flatRows( self, assemblies=False ):
+        totals = self.totals()
+        for key in self.order():
+            if key == self.root:
+                continue
+            if key in self.children and not assemblies:
+                continue
+            yield self.makeRow( key, 0, totals[key], totals[key] )
+
+
+    # the indented BOM as text, as in the parts list: the labels of the
+    # links to each part, and the Variables of each assembly
+    def formatText( self, modelDoc=None ):
+        lines = []
+        parents = []
+        for row in self.treeRows():
+            key = ( row['document'], row['name'] )
+            level = row['level']
+            del parents[level:]
+            links = self.labels.get( parents[-1], {} ).get( key ) if parents else None
+            lines.append( formatRow( row, modelDoc, links ) )
+            variables = self.variables.get( key )
+            if variables:
+                lines.append( '\t'*(level+1)+'Variables:' )
+                for ( name, value ) in variables:
+                    lines.append( '\t'*(level+2)+name+' = '+value )
+            parents.append( key )
+        return '\n'.join( lines )
+
+
+    def makeRow( self, key, level, quantity, total ):
+        row = dict( self.parts[key] )
+        row['level']    = level
+        row['quantity'] = quantity
+        row['total']    = total
+        return row
+
+
+    # keeps the table up to date with the changes of the documents. The
+    # changes are only recorded, and applied by refresh()
+    def follow( self ):
+        cacheLib.addCache( self )
+
+
+    def stop( self ):
+        cacheLib.removeCache( self )
+
+
+    # document observer callbacks, see cacheLib
+    def objectChanged( self, obj, prop ):
+        key = partKey(obj)
+        # the Variables are shown with their assembly
+        if obj.Name == 'Variables' and key in self.instances:
+            self.dirtyParts.add( self.instances[key] )
+        if prop is None or prop in structureProperties:
+            if key in self.instances:
+                self.dirtyAssemblies.add( self.instances[key] )
+            if key in self.children or key in self.members:
+                self.dirtyAssemblies.add( key )
+        if key in self.parts and ( prop is None or prop in partProperties ):
+            self.dirtyParts.add( key )
+
+
+    def objectDeleted( self, obj ):
+        self.objectChanged( obj, None )
+
+
+    def documentClosed( self, doc ):
+        if doc.Name == self.root[0]:
+            self.valid = False
+            self.stop()
+        elif any( key[0] == doc.Name for key in self.parts ):
+            self.rebuild = True
+
+
+    # applies the recorded changes: only the changed assemblies are walked
+    # again, and only the changed parts are read again. Returns whether
+    # something changed
+    def refresh( self ):
+        if not self.valid or not ( self.dirtyParts or self.dirtyAssemblies or self.rebuild ):
+            return False
+        ( parts, self.dirtyParts ) = ( self.dirtyParts, set() )
+        ( assemblies, self.dirtyAssemblies ) = ( self.dirtyAssemblies, set() )
+        if self.rebuild:
+            self.rebuild = False
+            self.build()
+            return True
+        self.expand( [ a for a in map( getObject, assemblies & set(self.parts) ) if a ] )
+        self.prune()
+        for key in parts & set(self.parts):
+            obj = getObject(key)
+            if obj:
+                self.addPart(obj)
+        return True
+
+
+    # forgets the parts that aren't used anymore
+    def prune( self ):
+        used = set()
+        keys = [ self.root ]
+        while keys:
+            key = keys.pop()
+            if key not in used:
+                used.add(key)
+                keys.extend( self.children.get( key, () ) )
+        for key in [ k for k in self.parts if k not in used ]:
+            self.parts.pop(key)
+            self.staleMass.discard(key)
+            self.children.pop( key, None )
+            self.labels.pop( key, None )
+            self.variables.pop( key, None )
+            for member in self.members.pop( key, () ):
+                self.instances.pop( member, None )
+
+
+
+# the ( child, quantity, level, total ) of the children of an assembly,
+# used total times
+def iterChildren( children, level, total ):
+    for ( key, quantity ) in children.items():
+        yield ( key, quantity, level, quantity * total )
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                 part geometry                 |
+    +-----------------------------------------------+
+"""
+def getGeometry( obj, volume=True ):
+    data = { 'xLength': '', 'yLength': '', 'zLength': '', 'volume': '', \
+             'area': '', 'centerOfMass': '', 'inertia': '' }
+    shape = getattr( obj, 'Shape', None )
+    if shape is None or shape.isNull():
+        return data
+    # read from the cache if the shape didn't change since the last BOM
+    bb = coreLib.getShapeProperty( obj, 'BoundBox', shape=shape )
+    if isReal(bb):
+        data['xLength'] = round( bb.XLength, 1 )
+        data['yLength'] = round( bb.YLength, 1 )
+        data['zLength'] = round( bb.ZLength, 1 )
+    if not volume:
+        return data
+    try:
+        data['volume'] = round( coreLib.getShapeProperty( obj, 'Volume', shape=shape ), 3 )
+    except Exception:
+        pass
+    return data
+
+
+# check if the BoundingBox is a real one
+def isReal( bb ):
+    return bb.isValid() and abs(max(bb.XLength,bb.YLength,bb.ZLength)) < 1e+10
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |       BOM read from the files themselves      |
+    +-----------------------------------------------+
+"""
+# the objects of the .FCStd files, as read by fcstdLib, look enough like
+# FreeCAD objects for bomTable and walkTree. The files are read only once
+class fileBomTable( bomTable ):
+    def __init__( self, fileName, geometry=False, modelName='Model' ):
+        # file name -> fileDocument
+        self.documents = {}
+        # document name -> file name
+        self.names = {}
+        model = self.getDocument( fileName ).getObject( modelName )
+        if model is None:
+            raise ValueError( 'no '+modelName+' in '+fileName )
+        bomTable.__init__( self, model, volumes=geometry )
+        fcstdLib.flush()
+
+
+    # the objects are keyed by document name, 2 files with the same name
+    # in different directories mustn't get the same one
+    def getDocument( self, fileName ):
+        fileName = os.path.abspath( fileName )
+        if fileName not in self.documents:
+            name = fcstdLib.documentName( fileName )
+            if name in self.names:
+                name = fcstdLib.documentName( fileName, unique=True )
+            self.names[name] = fileName
+            self.documents[fileName] = fileDocument( self, fileName, name )
+        return self.documents[fileName]
+
+
+    # the geometry is read from the file only if it's asked for
+    def getGeometry( self, obj ):
+        data = { 'xLength': '', 'yLength': '', 'zLength': '', 'volume': '', \
+                 'area': '', 'centerOfMass': '', 'inertia': '' }
+        if not self.volumes or not getattr( obj, 'Shape', None ):
+            return data
+        geometry = fcstdLib.getGeometry( obj.Document.FileName, obj.Name )
+        if geometry:
+            for field in ( 'xLength', 'yLength', 'zLength' ):
+                data[field] = round( geometry[field], 1 )
+            if geometry['volume'] != '':
+                data['volume'] = round( geometry['volume'], 3 )
+        return data
+
+
+    # the table can't follow the files
+    def follow( self ):
+        pass
+
+
+
+class fileDocument():
+    def __init__( self, table, fileName, name=None ):
+        self.table = table
+        self.FileName = fileName
+        self.Name = name or fcstdLib.documentName( fileName )
+        self.objects = fcstdLib.getDocument( fileName )['objects']
+
+    def getObject( self, name ):
+        if name in self.objects:
+            return fileObject( self, name )
+        return None
+
+
+
+class fileObject():
+    def __init__( self, doc, name ):
+        data = doc.objects[name]
+        self.Document = doc
+        self.Name = name
+        self.TypeId = data['type']
+        self.Label  = data['strings'].get( 'Label', name )
+        self.Label2 = data['strings'].get( 'Label2', '' )
+        self.data = data
+        # the name of the shape in the file, only if it has one
+        if data['shape']:
+            self.Shape = data['shape']
+
+    # the other string properties, like PartInfo
+    def __getattr__( self, name ):
+        strings = self.__dict__['data']['strings']
+        if name in strings:
+            return strings[name]
+        raise AttributeError( name )
+
+    def getSubObjects( self, reason=0 ):
+        return [ name+'.' for name in self.data['group'] ]
+
+    # links to links are followed, in the same or other files. If the
+    # target can't be found, it's the link itself
+    def getLinkedObject( self, recursive=True ):
+        obj = self
+        for i in range(100):
+            if not obj.data['link']:
+                break
+            ( fileName, name ) = obj.data['link']
+            doc = obj.Document
+            if fileName:
+                fileName = os.path.normpath( os.path.join( os.path.dirname(doc.FileName), fileName ) )
+                if not os.path.isfile( fileName ):
+                    break
+                doc = doc.table.getDocument( fileName )
+            target = doc.getObject( name )
+            if target is None:
+                break
+            obj = target
+            if not recursive:
+                break
+        return obj
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |              text of the BOM                  |
+    +-----------------------------------------------+
+"""
+# one line per row: indent, quantity, links -> document#label (description), size
+def formatRow( row, modelDoc=None, links=None ):
+    text = '\t'*row['level']
+    if row['level'] > 0:
+        text += str(row['quantity'])+' x '
+    if links:
+        text += ', '.join( links[0:3] )
+        if len(links) > 3:
+            text += ', ...'
+        text += ' -> '
+    if row['document'] != modelDoc:
+        text += row['document']+'#'
+    text += row['label']
+    if row['description']:
+        text += ' ('+row['description']+')'
+    if row['xLength'] != '':
+        text += ', Size: '+str(row['xLength'])+' x '+str(row['yLength'])+' x '+str(row['zLength'])
+    return text
+
+
+def formatText( rows, modelDoc=None ):
+    return '\n'.join( [ formatRow( row, modelDoc ) for row in rows ] )
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                export the rows                |
+    +-----------------------------------------------+
+"""
+# each row is written as soon as it's produced, nothing else is kept
+def writeCSV( rows, fileName, delimiter=',' ):
+    with open( fileName, 'w', newline='' ) as f:
+        writer = csv.writer( f, delimiter=delimiter )
+        writer.writerow( titles )
+        count = 0
+        for row in rows:
+            writer.writerow( [ row[field] for field in fields ] )
+            count += 1
+    return count
+
+
+# one JSON object per line
+def writeJSONLines( rows, fileName ):
+    with open( fileName, 'w' ) as f:
+        count = 0
+        for row in rows:
+            f.write( json.dumps( row ) + '\n' )
+            count += 1
+    return count
+
+
+# one JSON array of objects, written one row at a time
+def writeJSON( rows, fileName ):
+    with open( fileName, 'w' ) as f:
+        count = 0
+        f.write( '[' )
+        for row in rows:
+            if count:
+                f.write( ',' )
+            f.write( '\n' + json.dumps( row ) )
+            count += 1
+        f.write( '\n]\n' )
+    return count
+
+
+# into a Spreadsheet of the document, replaced if it exists
+def writeSpreadsheet( rows, doc, name='BOM' ):
+    sheet = doc.getObject(name)
+    if sheet and sheet.TypeId == 'Spreadsheet::Sheet':
+        sheet.clearAll()
+    else:
+        sheet = doc.addObject( 'Spreadsheet::Sheet', name )
+    columns = [ columnName(i) for i in range(len(fields)) ]
+    for column, title in zip( columns, titles ):
+        sheet.set( column+'1', title )
+    count = 0
+    for row in rows:
+        line = str( count+2 )
+        for column, field in zip( columns, fields ):
+            value = str( row[field] )
+            if value:
+                # text starting with = would be a formula
+                if value.startswith('='):
+                    value = "'"+value
+                sheet.set( column+line, value )
+        count += 1
+    sheet.recompute()
+    return count
+
+
+# A, B ... Z, AA, AB ...
+def columnName( index ):
+    name = ''
+    index += 1
+    while index:
+        ( index, rest ) = divmod( index-1, 26 )
+        name = chr( ord('A')+rest ) + name
+    return name
+
+
+# the instances visible in a saved configuration, for bomTable. The
+# objects that aren't in the configuration are counted
+def configurationFilter( model, configuration ):
+    conf = configurationLib.getConfig( configuration, 'Configurations', model.Document )
+    if conf is None:
+        raise ValueError( 'no configuration '+configuration+' in '+model.Document.Name )
+    visibilities = configurationLib.getVisibilities( conf )
+    def accept( obj ):
+        if obj.Document != model.Document:
+            return True
+        return visibilities.get( configurationLib.GetObjectName(obj), True )
+    return accept
+
+
+# export the BOM of the model, the format is given by the extension of
+# the file (.csv, .tsv, .jsonl or .json), or to a Spreadsheet if
+# fileName is None. An already built bomTable can be given.
+# Returns the number of rows written
+def exportBOM( model, fileName=None, flat=False, bom=None ):
+    if bom is None:
+        bom = bomTable( model )
+    rows = bom.flatRows() if flat else bom.treeRows()
+    if fileName is None:
+        return writeSpreadsheet( rows, model.Document )
+    extension = os.path.splitext(fileName)[1].lower()
+    if extension == '.jsonl':
+        return writeJSONLines( rows, fileName )
+    if extension == '.json':
+        return writeJSON( rows, fileName )
+    if extension == '.tsv':
+        return writeCSV( rows, fileName, '\t' )
+    return writeCSV( rows, fileName )
+
+
+# batch task, see batchLib: exports the BOM of a file next to it. With
+# 'structure', the file isn't opened, see fileBomTable
+def bomTask( job ):
+    output = os.path.splitext( job['file'] )[0] + '.bom.' + job.get( 'format', 'csv' )
+    if job.get('structure'):
+        bom = fileBomTable( job['file'], job.get('geometry', False) )
+        count = exportBOM( None, output, job.get('flat', False), bom )
+        return { 'status': 'ok', 'message': str(count)+' rows in '+output }
+    import batchLib
+    ( doc, loaded ) = batchLib.openDocument( job['file'] )
+    try:
+        model = doc.getObject('Model')
+        if model is None:
+            return { 'status': 'error', 'message': 'no Model in this document' }
+        count = exportBOM( model, output, job.get('flat', False) )
+    finally:
+        batchLib.closeDocuments( loaded )
+    return { 'status': 'ok', 'message': str(count)+' rows in '+output }
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                compare two BOMs               |
+    +-----------------------------------------------+
+"""
+diffFields = [ 'change', 'document', 'name', 'label', 'before', 'after' ]
+
+
+# the rows of the flat BOM, with the assemblies, keyed by ( document, name ).
+# The document of the Model is '' so that two revisions of a file have the
+# same keys, even if the second one was renamed when opened
+def keyedRows( bom ):
+    rows = {}
+    for row in bom.flatRows( assemblies=True ):
+        document = '' if row['document'] == bom.root[0] else row['document']
+        rows[ (document, row['name']) ] = row
+    return rows
+
+
+# the added, removed and changed parts, with their total quantity before
+# and after, in one pass over each side
+def diffRows( before, after ):
+    diff = []
+    for ( key, row ) in before.items():
+        other = after.get(key)
+        if other is None:
+            diff.append( makeDiff( 'removed', key, row, row['total'], 0 ) )
+        elif other['total'] != row['total']:
+            diff.append( makeDiff( 'changed', key, other, row['total'], other['total'] ) )
+    for ( key, row ) in after.items():
+        if key not in before:
+            diff.append( makeDiff( 'added', key, row, 0, row['total'] ) )
+    return diff
+
+
+def makeDiff( change, key, row, before, after ):
+    return { 'change': change, 'document': key[0], 'name': key[1], 'label': row['label'], \
+             'before': before, 'after': after }
+
+
+def diffConfigurations( model, before, after ):
+    rows = []
+    for configuration in ( before, after ):
+        bom = bomTable( model, volumes=False, accept=configurationFilter( model, configuration ) )
+        rows.append( keyedRows(bom) )
+    return diffRows( *rows )
+
+
+# the keyed rows of a file, or of one of its configurations. The file and
+# the documents it loaded are closed afterwards
+def fileRows( fileName, configuration=None ):
+    import batchLib
+    ( doc, loaded ) = batchLib.openDocument( fileName )
+    try:
+        model = doc.getObject('Model')
+        if model is None:
+            raise ValueError( 'no Model in '+fileName )
+        accept = None
+        if configuration:
+            accept = configurationFilter( model, configuration )
+        return keyedRows( bomTable( model, volumes=False, accept=accept ) )
+    finally:
+        batchLib.closeDocuments( loaded )
+
+
+# the files are opened one after the other, so that their documents
+# don't get renamed
+def diffFiles( before, after, beforeConfiguration=None, afterConfiguration=None ):
+    return diffRows( fileRows( before, beforeConfiguration ), fileRows( after, afterConfiguration ) )
+
+
+# batch task, see batchLib: compares file and other, or two configurations
+def diffTask( job ):
+    diff = diffFiles( job['file'], job.get('other') or job['file'], \
+                      job.get('configuration'), job.get('otherConfiguration') )
+    return { 'status': 'ok', 'message': str(len(diff))+' differences', 'diff': diff }
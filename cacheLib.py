@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# cacheLib.py
+#
+# caches of values that are expensive to look up again and again,
+# invalidated by a document observer
+#
+# this file doesn't import any GUI module, so that it can also be used
+# from FreeCADCmd
+
+
+
+import re
+
+import FreeCAD as App
+
+
+
+"""
+    +-----------------------------------------------+
+    |                Global variables               |
+    +-----------------------------------------------+
+"""
+# the document observer invalidating all caches
+observer = None
+
+# changing these properties doesn't change any cached value
+ignoredProperties = [ 'Visibility', 'ViewObject', 'State' ]
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |     resolved Placements of LCS and Datums     |
+    +-----------------------------------------------+
+"""
+# Placements of datum objects, resolved once, whatever the number of
+# links using them. Keys are (docName,objName) tuples, the values are
+# whatever the caller stores, typically a 4x4 matrix
+class placementCache():
+    def __init__(self):
+        self.entries = {}
+        # (docName,supportName) -> keys of the entries attached to that support
+        self.supports = {}
+
+
+    def get( self, key ):
+        return self.entries.get(key)
+
+
+    # store the value for the datum object obj. The value is not stored if
+    # the object still needs a recompute, it wouldn't be its final value
+    def store( self, obj, value ):
+        if 'Touched' in obj.State or 'Invalid' in obj.State:
+            return
+        key = ( obj.Document.Name, obj.Name )
+        self.entries[key] = value
+        if hasattr(obj,'Support') and obj.Support:
+            for ( supportObj, subNames ) in obj.Support:
+                supportKey = ( supportObj.Document.Name, supportObj.Name )
+                self.supports.setdefault( supportKey, set() ).add(key)
+
+
+    def objectDeleted( self, obj ):
+        self.invalidate( (obj.Document.Name, obj.Name) )
+
+
+    def invalidate( self, key ):
+        self.entries.pop( key, None )
+        # the datum objects attached to this one will move too
+        for attached in self.supports.pop( key, () ):
+            if attached != key:
+                self.invalidate(attached)
+
+
+    def objectChanged( self, obj, prop ):
+        self.invalidate( (obj.Document.Name, obj.Name) )
+
+
+    def documentClosed( self, doc ):
+        for key in [ k for k in self.entries if k[0] == doc.Name ]:
+            self.entries.pop(key)
+        for key in [ k for k in self.supports if k[0] == doc.Name ]:
+            self.supports.pop(key)
+
+
+
+# the global cache of datum Placements
+lcsPlacements = placementCache()
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |   reverse index: object -> links pointing to  |
+    +-----------------------------------------------+
+"""
+# for each linked object, the App::Link objects pointing to it. The index of
+# a document is built the first time it's asked for, and then kept current
+# by the observer. Keys are (docName,objName) tuples
+class linkIndex():
+    def __init__(self):
+        # documents already indexed
+        self.documents = set()
+        # link -> linked object
+        self.targets = {}
+        # linked object -> { link: None }, a dict to keep the document order
+        self.links = {}
+
+
+    def indexDocument( self, doc ):
+        if doc.Name in self.documents:
+            return
+        self.documents.add( doc.Name )
+        for obj in doc.Objects:
+            self.addLink( obj )
+
+
+    def addLink( self, obj ):
+        if not hasattr(obj,'LinkedObject') or not obj.LinkedObject:
+            return
+        target = obj.LinkedObject
+        # LinkedObject can also be given with sub-elements
+        if isinstance( target, tuple ):
+            target = target[0]
+        key = ( obj.Document.Name, obj.Name )
+        targetKey = ( target.Document.Name, target.Name )
+        self.targets[key] = targetKey
+        self.links.setdefault( targetKey, {} )[key] = None
+
+
+    def removeLink( self, key ):
+        targetKey = self.targets.pop( key, None )
+        if targetKey is not None:
+            users = self.links.get(targetKey)
+            users.pop( key, None )
+            if not users:
+                self.links.pop(targetKey)
+
+
+    # the links pointing to obj, in the given document or in all open documents
+    def linksTo( self, obj, doc=None ):
+        watch()
+        docs = [ doc ] if doc else App.listDocuments().values()
+        for d in docs:
+            self.indexDocument( d )
+        result = []
+        for ( docName, linkName ) in self.links.get( (obj.Document.Name, obj.Name), () ):
+            if doc and docName != doc.Name:
+                continue
+            linkDoc = App.listDocuments().get(docName)
+            link = linkDoc.getObject(linkName) if linkDoc else None
+            if link:
+                result.append(link)
+        return result
+
+
+    # the links of doc pointing to objects of the documents named docNames
+    def linksToDocuments( self, docNames, doc ):
+        watch()
+        self.indexDocument( doc )
+        result = []
+        for ( key, targetKey ) in self.targets.items():
+            if key[0] == doc.Name and targetKey[0] in docNames:
+                link = doc.getObject( key[1] )
+                if link:
+                    result.append(link)
+        return result
+
+
+    def objectChanged( self, obj, prop ):
+        if obj.Document.Name not in self.documents:
+            return
+        if prop is None or prop == 'LinkedObject':
+            self.removeLink( (obj.Document.Name, obj.Name) )
+            self.addLink( obj )
+
+
+    def objectDeleted( self, obj ):
+        self.removeLink( (obj.Document.Name, obj.Name) )
+
+
+    def documentClosed( self, doc ):
+        self.documents.discard( doc.Name )
+        for key in [ k for k in self.targets if k[0] == doc.Name ]:
+            self.removeLink(key)
+
+
+
+# the global index of links
+links = linkIndex()
+
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |          datum objects found in a part        |
+    +-----------------------------------------------+
+"""
+# the datum objects (LCS, planes, axes, points) of a part, including those
+# in its groups. An entry is dropped when the part, one of its groups or one
+# of its datums is created, deleted or gets a new Group
+class datumIndex():
+    def __init__(self):
+        # (docName,partName) -> list of datum objects
+        self.entries = {}
+        # (docName,objName) of a group or datum -> keys of the parts containing it
+        self.members = {}
+
+
+    def get( self, part ):
+        return self.entries.get( (part.Document.Name, part.Name) )
+
+
+    # groups are the part itself and the groups in it
+    def store( self, part, datums, groups ):
+        key = ( part.Document.Name, part.Name )
+        self.entries[key] = datums
+        for obj in list(groups) + list(datums):
+            self.members.setdefault( (obj.Document.Name, obj.Name), set() ).add(key)
+
+
+    def invalidate( self, key ):
+        for partKey in self.members.pop( key, () ):
+            self.entries.pop( partKey, None )
+
+
+    def objectChanged( self, obj, prop ):
+        if prop is None or prop == 'Group':
+            self.invalidate( (obj.Document.Name, obj.Name) )
+
+
+    def objectDeleted( self, obj ):
+        self.invalidate( (obj.Document.Name, obj.Name) )
+
+
+    def documentClosed( self, doc ):
+        for key in [ k for k in self.entries if k[0] == doc.Name ]:
+            self.entries.pop(key)
+        for key in [ k for k in self.members if k[0] == doc.Name ]:
+            self.members.pop(key)
+
+
+
+# the global index of datum objects per part
+partDatums = datumIndex()
+
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |           unique names of new objects         |
+    +-----------------------------------------------+
+"""
+# for each document, the numbers used after each name prefix, so that the
+# first free name like HoleAxis_12 is found without asking the document for
+# all the others. The numbers of a document are seeded from its objects when
+# first used, and the observer keeps them up-to-date with the objects created
+# and deleted later, so that the numbers of deleted objects are used again
+class nameAllocator():
+    def __init__(self):
+        # docName -> { prefix: set of numbers }
+        self.counters = {}
+
+
+    def getCounters( self, doc ):
+        watch()
+        counters = self.counters.get(doc.Name)
+        if counters is None:
+            counters = {}
+            self.counters[doc.Name] = counters
+            for obj in doc.Objects:
+                self.record( counters, obj.Name )
+        return counters
+
+
+    def record( self, counters, name, used=True ):
+        match = numberedName.match(name)
+        if match:
+            ( prefix, number ) = ( match.group(1), int(match.group(2)) )
+            if used:
+                counters.setdefault( prefix, set() ).add( number )
+            elif prefix in counters:
+                counters[prefix].discard( number )
+
+
+    # the first free number after prefix, at least start. The number is only
+    # proposed, it's taken when the object is created
+    def next( self, doc, prefix, start=1 ):
+        used = self.getCounters(doc).get( prefix, () )
+        number = start
+        while number in used:
+            number += 1
+        return number
+
+
+    def objectChanged( self, obj, prop ):
+        if prop is None and obj.Document.Name in self.counters:
+            self.record( self.counters[obj.Document.Name], obj.Name )
+
+
+    def objectDeleted( self, obj ):
+        if obj.Document.Name in self.counters:
+            self.record( self.counters[obj.Document.Name], obj.Name, used=False )
+
+
+    def documentClosed( self, doc ):
+        self.counters.pop( doc.Name, None )
+
+
+
+# a name ending with a number: prefix, number
+numberedName = re.compile( r'^(.*?)(\d+)$' )
+
+# the global name allocator
+names = nameAllocator()
+
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |        geometric properties of shapes         |
+    +-----------------------------------------------+
+"""
+# BoundBox, Volume, Area ... of the shape of an object, or of one of its
+# sub-shapes. Keys are (docName,objName,subName) tuples. A value is only
+# valid for the shape it was computed for, identified by its hashCode(),
+# and the entries of an object are dropped when its Shape changes
+class geometryCache():
+    def __init__(self):
+        # key -> ( shape hash, { property: value } )
+        self.entries = {}
+        # (docName,objName) -> keys of its entries
+        self.objects = {}
+
+
+    # the property of the shape, computed by compute(shape) if not known
+    def get( self, key, shape, name, compute ):
+        stamp = shape.hashCode()
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != stamp:
+            entry = ( stamp, {} )
+            self.entries[key] = entry
+            self.objects.setdefault( key[0:2], set() ).add(key)
+        values = entry[1]
+        if name not in values:
+            values[name] = compute(shape)
+        return values[name]
+
+
+    def invalidate( self, objKey ):
+        for key in self.objects.pop( objKey, () ):
+            self.entries.pop( key, None )
+
+
+    def objectChanged( self, obj, prop ):
+        if prop is None or prop in ( 'Shape', 'Placement' ):
+            self.invalidate( (obj.Document.Name, obj.Name) )
+
+
+    def objectDeleted( self, obj ):
+        self.invalidate( (obj.Document.Name, obj.Name) )
+
+
+    def documentClosed( self, doc ):
+        for objKey in [ k for k in self.objects if k[0] == doc.Name ]:
+            self.invalidate(objKey)
+
+
+
+# the global cache of geometric properties
+geometry = geometryCache()
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |     document observer invalidating caches     |
+    +-----------------------------------------------+
+"""
+class cacheObserver():
+    def __init__(self):
+        self.caches = []
+
+    def slotChangedObject( self, obj, prop ):
+        if prop in ignoredProperties or not obj.Document:
+            return
+        for cache in list(self.caches):
+            cache.objectChanged( obj, prop )
+
+    def slotCreatedObject( self, obj ):
+        if obj.Document:
+            for cache in list(self.caches):
+                cache.objectChanged( obj, None )
+
+    def slotDeletedObject( self, obj ):
+        if obj.Document:
+            for cache in list(self.caches):
+                cache.objectDeleted( obj )
+
+    def slotDeletedDocument( self, doc ):
+        for cache in list(self.caches):
+            cache.documentClosed( doc )
+
+
+
+# start the observer (once). Caches are only valid while it's running,
+# so they must call this before being filled
+def watch():
+    global observer
+    if observer is None:
+        observer = cacheObserver()
+        observer.caches = [ lcsPlacements, links, partDatums, names, geometry ]
+        App.addDocumentObserver(observer)
+    return observer
+
+
+# other objects can be told about the changes of the documents, they need
+# the same objectChanged(), objectDeleted() and documentClosed() as the caches
+def addCache( cache ):
+    caches = watch().caches
+    if cache not in caches:
+        caches.append( cache )
+
+
+def removeCache( cache ):
+    if observer is not None and cache in observer.caches:
+        observer.caches.remove( cache )
@@ -3,7 +3,7 @@
 #
 # configurationEngine.py
 #
-# The code to save and restore configurations, using spreadsheets
+# The code to save and restore configurations, stored by configurationLib
 
 import math
 from PySide import QtGui, QtCore
@@ -12,20 +12,9 @@ import FreeCAD as App
 from FreeCAD import Console as FCC
 
 import libAsm4 as Asm4
-
-HEADER_CELL             = 'A1'
-DESCRIPTION_CELL        = 'A2'
-OBJECTS_START_ROW       = '5'
-OBJECT_NAME_COL         = 'A'
-OBJECT_VISIBLE_COL      = 'B'
-OBJECT_ASM_TYPE_COL     = 'C'
-OFFSET_POS_X_COL        = 'D'
-OFFSET_POS_Y_COL        = 'E'
-OFFSET_POS_Z_COL        = 'F'
-OFFSET_ROT_YAW_COL      = 'G'
-OFFSET_ROT_PITCH_COL    = 'H'
-OFFSET_ROT_ROLL_COL     = 'I'
-
+import selectionLib
+import solverLib
+from configurationLib import *
 
 
 
@@ -48,7 +37,7 @@ class saveConfigurationCmd:
     def IsActive(self):
         # Will handle LCSs only for the Assembly4 model
         #if Asm4.getSelectedLink() or Asm4.getModelSelected():
-        if Asm4.getSelectedLink() or Asm4.checkModel():
+        if selectionLib.getSelectedLink() or Asm4.checkModel():
             return True
         return False
 
@@ -80,11 +69,8 @@ class saveConfigurationUI():
         # draw the GUI, objects are defined later down
         self.drawUI()
         # Fill the configurations list
-        confGroup = GetGroup('Configurations')
-        if confGroup:
-            for obj in confGroup.OutList:
-                if obj.TypeId == 'Spreadsheet::Sheet':
-                    self.addListEntry(obj.Label, getConfigDescription(obj))
+        for obj in listConfigurations():
+            self.addListEntry(obj.Label, getConfigDescription(obj))
 
     # standard FreeCAD Task panel buttons
     def getStandardButtons(self):
@@ -119,85 +105,32 @@ class saveConfigurationUI():
     def SaveConfiguration(self, confName, description):
         FCC.PrintMessage('Saving configuration to "' + confName + '"\n')
         conf = getConfig(confName, 'Configurations')
+        records = {}
         if conf:
             confirm = Asm4.confirmBox('Override cofiguration in "' + confName + '"?')
             if not confirm:
                 FCC.PrintMessage('Cancel save...\n')
                 return
-            else:
-                setConfigDescription(conf, description)
-        else:
-            conf = self.createConfig(confName, description, 'Configurations')
+            records = readConfiguration(conf)
 
         model = App.ActiveDocument.getObject('Model')
         link  = Asm4.getSelectedLink()
         if link:
-            self.SaveObject(conf, link)
+            self.SaveObject(records, link)
         else:
-            self.SaveSubObjects(conf, model)            
+            self.SaveSubObjects(records, model)
+        # all the objects are written at once
+        conf = storeConfiguration(confName, description, records)
         conf.recompute(True)
     
 
-    def SaveSubObjects(self, conf, container):
-        for objName in container.getSubObjects():
-            obj = container.getSubObject(objName, 1)
-            #if obj.TypeId == 'App::Link':
-            self.SaveObject(conf, obj)
-
-
-    def SaveObject(self, conf, obj):
-        # parse App::Part containers, and only those
-        if obj.TypeId == 'App::Part':
-            self.SaveSubObjects(conf, obj)
-
-        parentObj, objFullName = obj.Parents[0]
-        #objName = App.ActiveDocument.Name + '.' + parentObj.Name + '.' + objFullName
-        objName = parentObj.Name + '.' + objFullName[0:-1]
-
-        row = GetObjectRow(conf, objName)
-        if row is None:
-            conf.insertRows(OBJECTS_START_ROW, 1)
-            row = OBJECTS_START_ROW
-
-        conf.set( OBJECT_NAME_COL       + row,  objName )
-        conf.setAlias(OBJECT_NAME_COL   + row,  GetValidAlias(objName) )
-        # always store visibility info
-        conf.set( OBJECT_VISIBLE_COL    + row,  str(obj.ViewObject.Visibility) )
-        # check how this object is assembled
-        asmType = '-'
-        if hasattr(obj,'AssemblyType'):
-            asmType = obj.AssemblyType
-        conf.set( OBJECT_ASM_TYPE_COL       + row,  str(asmType) )
-        if asmType == 'Asm4EE':
-            offset = obj.AttachmentOffset
-            conf.set( OFFSET_POS_X_COL      + row,  str(offset.Base.x) )
-            conf.set( OFFSET_POS_Y_COL      + row,  str(offset.Base.y) )
-            conf.set( OFFSET_POS_Z_COL      + row,  str(offset.Base.z) )
-            conf.set( OFFSET_ROT_YAW_COL    + row,  str(offset.Rotation.toEuler()[0]) )
-            conf.set( OFFSET_ROT_PITCH_COL  + row,  str(offset.Rotation.toEuler()[1]) )
-            conf.set( OFFSET_ROT_ROLL_COL   + row,  str(offset.Rotation.toEuler()[2]) )
-
-
-    def createConfig(self, name, description, groupName=''):
-        group = GetGroup(groupName)
-        if not group:
-            # create a group Configurations to store various config tables
-            group = App.ActiveDocument.getObject('Model').newObject('App::DocumentObjectGroup','Configurations')
-        # Create the document
-        conf = group.newObject('Spreadsheet::Sheet', name)
-        headerRow = str(int(OBJECTS_START_ROW)-1)
-        conf.set(HEADER_CELL,           'Assembly4 configuration table')
-        conf.set(DESCRIPTION_CELL,      str(description))
-        conf.set(OBJECT_NAME_COL      + headerRow, 'ObjectName')
-        conf.set(OBJECT_VISIBLE_COL   + headerRow, 'Visible')
-        conf.set(OBJECT_ASM_TYPE_COL  + headerRow, 'Assembly Type')
-        conf.set(OFFSET_POS_X_COL     + headerRow, 'Pos. X')
-        conf.set(OFFSET_POS_Y_COL     + headerRow, 'Pos. Y')
-        conf.set(OFFSET_POS_Z_COL     + headerRow, 'Pos. Z')
-        conf.set(OFFSET_ROT_YAW_COL   + headerRow, 'Rot. Yaw')
-        conf.set(OFFSET_ROT_PITCH_COL + headerRow, 'Rot. Pitch')
-        conf.set(OFFSET_ROT_ROLL_COL  + headerRow, 'Rot. Roll')
-        return conf
+    def SaveSubObjects(self, records, container):
+        for obj in configurationObjects(container):
+            self.SaveObject(records, obj)
+
+
+    def SaveObject(self, records, obj):
+        records[GetObjectName(obj)] = makeRecord(obj, obj.ViewObject.Visibility)
 
 
     def onListChange(self):
@@ -304,11 +237,8 @@ class restoreConfigurationUI():
         # draw the GUI, objects are defined later down
         self.drawUI()
         # Fill the configurations list
-        confGroup = GetGroup('Configurations')
-        if confGroup:
-            for obj in confGroup.OutList:
-                if obj.TypeId == 'Spreadsheet::Sheet':
-                    self.addListEntry(obj.Label, getConfigDescription(obj))
+        for obj in listConfigurations():
+            self.addListEntry(obj.Label, getConfigDescription(obj))
 
 
     # standard FreeCAD Task panel buttons
@@ -368,58 +298,6 @@ class restoreConfigurationUI():
     |                 Helper Functions              |
     +-----------------------------------------------+
 """
-def getConfig(name, groupName=''):
-    retval = None
-    # Get the needed configuration table
-    group = GetGroup(groupName)
-    if group:
-        retval = group.getObject(name)
-    return retval
-
-#def GetGroup(groupName, create=True):
-def GetGroup(groupName):
-    # Look for the specified group, or ActiveDocument if not specified
-    group = None
-    if groupName != '':
-        group = App.ActiveDocument.getObject(groupName)
-    return group
-
-
-def setConfigDescription(conf, description):
-    conf.set(DESCRIPTION_CELL, str(description))
-
-
-def getConfigDescription(conf):
-    return str(conf.get(DESCRIPTION_CELL)).strip()
-
-
-def GetValidAlias(str):
-    # Spreadsheed doesn't like many characters in the alias, specifically the '.' that we need to separate sub-sub-links
-    # For now we will just remove all those characters in hope that there will be no duplication
-    badChars = '`~!@#$%^&*()-+=|\;:\'".,'
-    ret = ''
-    for char in str:
-        if char not in badChars:
-            ret = ret + char
-    # Should not have '_' at the beginning of the string...
-    ret = ret.strip('_')
-    return ret
-
-
-def GetObjectRow(conf, name):
-    cell = conf.getCellFromAlias(GetValidAlias(name))
-    if cell:
-        # leave only numbers in the cell string
-        row = ''.join(i for i in cell if i.isdigit())
-        return row
-    return None
-
-
-def GetObjectData(conf, name, col):
-    row = GetObjectRow(conf, name)
-    return conf.get(str(col) + str(row))
-
-
 class ListEntry(QtGui.QListWidgetItem):
     name = ''
     description = ''
@@ -431,51 +309,21 @@ class ListEntry(QtGui.QListWidgetItem):
 
 def RestoreConfiguration(docName):
     FCC.PrintMessage('Restoring configuration "' + docName + '"\n')
-    doc = getConfig(docName, 'Configurations')
+    # the whole configuration is read at once
+    records = readConfiguration(getConfig(docName, 'Configurations'))
     model = Asm4.checkModel()
     link = Asm4.getSelectedLink()
     if link:
-        RestoreObject(doc, link)
+        objects = [ link ]
     else:
-        RestoreSubObjects(doc, model)
-    App.ActiveDocument.recompute()
-
-
-def RestoreSubObjects(doc, container):
-    for objName in container.getSubObjects():
-        obj = container.getSubObject(objName, 1)
-        #if obj.TypeId == 'App::Link':
-        RestoreObject(doc, obj)
-
-
-def RestoreObject(doc, obj):
-    # parse App::Part containers, and only those
-    if obj.TypeId == 'App::Part':
-        SaveSubObjects(conf, obj)
-
-    parentObj, objFullName = obj.Parents[0]
-    #objName = App.ActiveDocument.Name + '.' + parentObj.Name + '.' + objFullName
-    objName = parentObj.Name + '.' + objFullName
-
-    row = GetObjectRow(doc, objName)
-    if row is None:
-        FCC.PrintMessage('No data for object "' + objName + '" in configuration "' + doc.Name + '"\n')
+        objects = configurationObjects(model)
+    # only the differences are applied, and only the moved links recomputed
+    changed = applyConfiguration(records, objects, App.ActiveDocument, Asm4.setViewVisibility)
+    if changed is None:
+        errors = solverLib.checkAssembly(App.ActiveDocument)
+        Asm4.warningBox('The configuration cannot be restored :\n\n' + '\n'.join(errors))
         return
-
-    vis   = doc.get( OBJECT_VISIBLE_COL   + row )
-    obj.ViewObject.Visibility = vis
-    asm   = str(doc.get( OBJECT_ASM_TYPE_COL  + row ))
-    if asm == 'Asm4EE':
-        x     = doc.get( OFFSET_POS_X_COL     + row )
-        y     = doc.get( OFFSET_POS_Y_COL     + row )
-        z     = doc.get( OFFSET_POS_Z_COL     + row )
-        yaw   = doc.get( OFFSET_ROT_YAW_COL   + row )
-        pitch = doc.get( OFFSET_ROT_PITCH_COL + row )
-        roll  = doc.get( OFFSET_ROT_ROLL_COL  + row )
-        position = App.Vector(x, y, z)
-        rotation = App.Rotation(yaw, pitch, roll)
-        offset = App.Placement(position, rotation)
-        obj.AttachmentOffset = offset
+    FCC.PrintMessage(str(len(changed)) + ' objects changed\n')
 
 
 """
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# configurationLib.py
+#
+# reads and writes the configurations of configurationEngine, also without the GUI
+#
+# a configuration is an App::FeaturePython in the Configurations group, all
+# its objects are stored in one JSON string, read and written in one go.
+# Configurations saved as spreadsheets by older versions are still read,
+# and converted when they're saved again
+#
+# usage:
+#   conf = configurationLib.getConfig( 'shipping', 'Configurations', doc )
+#   records = configurationLib.readConfiguration( conf )
+#   visible = configurationLib.getVisibilities( conf )
+#   configurationLib.applyConfiguration( records, configurationObjects(model), doc )
+#
+# the variants of many files can be written without the GUI, see batchLib:
+#   python3 batchLib.py --apply --configurations shipping service dir1 ...
+
+
+
+import os, json
+
+import FreeCAD as App
+from FreeCAD import Console as FCC
+
+import coreLib
+import solverLib
+
+
+
+"""
+    +-----------------------------------------------+
+    |                Global variables               |
+    +-----------------------------------------------+
+"""
+HEADER_CELL             = 'A1'
+DESCRIPTION_CELL        = 'A2'
+OBJECTS_START_ROW       = '5'
+OBJECT_NAME_COL         = 'A'
+OBJECT_VISIBLE_COL      = 'B'
+OBJECT_ASM_TYPE_COL     = 'C'
+OFFSET_POS_X_COL        = 'D'
+OFFSET_POS_Y_COL        = 'E'
+OFFSET_POS_Z_COL        = 'F'
+OFFSET_ROT_YAW_COL      = 'G'
+OFFSET_ROT_PITCH_COL    = 'H'
+OFFSET_ROT_ROLL_COL     = 'I'
+
+# the property of the configuration objects holding the JSON string:
+#   { objName: [ visible, assemblyType, x, y, z, yaw, pitch, roll ] }
+# the offset is only stored for Asm4EE objects
+DATA_PROPERTY           = 'ConfigurationData'
+
+# the characters the Spreadsheet doesn't accept in an alias
+BAD_ALIAS_CHARS         = '`~!@#$%^&*()-+=|\\;:\'".,'
+ALIAS_TABLE             = str.maketrans('', '', BAD_ALIAS_CHARS)
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                 Helper Functions              |
+    +-----------------------------------------------+
+"""
+def getConfig(name, groupName='', doc=None):
+    retval = None
+    # Get the needed configuration table
+    group = GetGroup(groupName, doc)
+    if group:
+        retval = group.getObject(name)
+    return retval
+
+#def GetGroup(groupName, create=True):
+def GetGroup(groupName, doc=None):
+    # Look for the specified group, in ActiveDocument if no document is specified
+    if doc is None:
+        doc = App.ActiveDocument
+    group = None
+    if groupName != '':
+        group = doc.getObject(groupName)
+    return group
+
+
+def setConfigDescription(conf, description):
+    if isSheetConfiguration(conf):
+        conf.set(DESCRIPTION_CELL, str(description))
+    else:
+        conf.Description = str(description)
+
+
+def getConfigDescription(conf):
+    if isSheetConfiguration(conf):
+        return str(conf.get(DESCRIPTION_CELL)).strip()
+    return conf.Description.strip()
+
+
+def GetValidAlias(str):
+    # Spreadsheed doesn't like many characters in the alias, specifically the '.' that we need to separate sub-sub-links
+    # They're all removed, findAliasCollisions() tells which names end up with the same alias
+    # Should not have '_' at the beginning of the string...
+    return str.translate(ALIAS_TABLE).strip('_')
+
+
+# the names that have the same alias, which a spreadsheet can't tell apart:
+# { alias: [ names ] } for the aliases shared by several names, sorted so
+# that the same names always give the same result
+def findAliasCollisions(names):
+    byAlias = {}
+    for name in sorted(set(names)):
+        byAlias.setdefault(GetValidAlias(name), []).append(name)
+    return { alias: found for alias, found in sorted(byAlias.items()) if len(found) > 1 }
+
+
+# objName -> row of a spreadsheet configuration, read once down the
+# name column instead of looking up the alias of each object
+def GetSheetIndex(conf):
+    index = {}
+    row = int(OBJECTS_START_ROW)
+    while True:
+        try:
+            objName = str(conf.get(OBJECT_NAME_COL + str(row)))
+        except ValueError:
+            break
+        if not objName:
+            break
+        index[objName] = str(row)
+        row += 1
+    return index
+
+
+def GetObjectRow(conf, name, index=None):
+    if index is not None:
+        return index.get(name)
+    cell = conf.getCellFromAlias(GetValidAlias(name))
+    if cell:
+        # leave only numbers in the cell string
+        return cell.lstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+    return None
+
+
+def GetObjectData(conf, name, col, index=None):
+    row = GetObjectRow(conf, name, index)
+    return conf.get(str(col) + str(row))
+
+
+# the objects stored in a configuration: all the objects in the container,
+# and in the App::Part containers inside it (but not inside linked parts)
+def configurationObjects(container):
+    for ( path, obj, linkedObj, depth, plc ) in coreLib.walkTree( container, descend=isPartContainer ):
+        if depth > 0:
+            yield obj
+
+
+def isPartContainer(obj, linkedObj, depth):
+    return obj.TypeId == 'App::Part'
+
+
+# the name of an object in the configurations: its parent and its path there
+def GetObjectName(obj):
+    parentObj, objFullName = obj.Parents[0]
+    return parentObj.Name + '.' + objFullName[0:-1]
+
+
+# the visibility of the objects in the configuration, by object name
+def getVisibilities(conf):
+    return { objName: record[0] for objName, record in readConfiguration(conf).items() }
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |           the configuration objects           |
+    +-----------------------------------------------+
+"""
+class configurationStore():
+    def __init__(self, obj):
+        obj.Proxy = self
+        obj.addProperty('App::PropertyString', 'Description', 'Configuration')
+        obj.addProperty('App::PropertyString', DATA_PROPERTY, 'Configuration')
+        # it's not meant to be edited by hand
+        obj.setEditorMode(DATA_PROPERTY, 2)
+        setattr(obj, DATA_PROPERTY, '{}')
+
+    def execute(self, obj):
+        pass
+
+    def __getstate__(self):
+        return None
+
+    def __setstate__(self, state):
+        return None
+
+
+def isConfiguration(obj):
+    return isSheetConfiguration(obj) or hasattr(obj, DATA_PROPERTY)
+
+
+# saved by an older version
+def isSheetConfiguration(obj):
+    return obj.TypeId == 'Spreadsheet::Sheet'
+
+
+def listConfigurations(doc=None):
+    group = GetGroup('Configurations', doc)
+    if not group:
+        return []
+    return [ obj for obj in group.OutList if isConfiguration(obj) ]
+
+
+def createConfiguration(name, description, doc=None):
+    if doc is None:
+        doc = App.ActiveDocument
+    group = GetGroup('Configurations', doc)
+    if not group:
+        # create a group Configurations to store the various configurations
+        group = doc.getObject('Model').newObject('App::DocumentObjectGroup','Configurations')
+    conf = group.newObject('App::FeaturePython', name)
+    configurationStore(conf)
+    conf.Description = str(description)
+    return conf
+
+
+# objName -> record, see DATA_PROPERTY
+def readConfiguration(conf):
+    if isSheetConfiguration(conf):
+        return readSheetConfiguration(conf)
+    return json.loads(getattr(conf, DATA_PROPERTY) or '{}')
+
+
+def writeConfiguration(conf, records):
+    setattr(conf, DATA_PROPERTY, json.dumps(records, separators=(',',':')))
+
+
+# writes the records in the configuration called name, which is created if
+# needed. A spreadsheet configuration is replaced
+def storeConfiguration(name, description, records, doc=None):
+    if doc is None:
+        doc = App.ActiveDocument
+    conf = getConfig(name, 'Configurations', doc)
+    if conf and isSheetConfiguration(conf):
+        doc.removeObject(conf.Name)
+        conf = None
+    if conf is None:
+        conf = createConfiguration(name, description, doc)
+    else:
+        setConfigDescription(conf, description)
+    writeConfiguration(conf, records)
+    return conf
+
+
+# the record of an object. The visibility is given by the GUI, which knows
+# it better; without the GUI it's the one of the document
+def makeRecord(obj, visible=None):
+    if visible is None:
+        visible = obj.Visibility
+    asmType = '-'
+    if hasattr(obj,'AssemblyType'):
+        asmType = obj.AssemblyType
+    record = [ bool(visible), str(asmType) ]
+    if asmType == 'Asm4EE':
+        offset = obj.AttachmentOffset
+        record += [ offset.Base.x, offset.Base.y, offset.Base.z ] + list(offset.Rotation.toEuler())
+    return record
+
+
+# the AttachmentOffset stored in the record, or None
+def recordOffset(record):
+    if record[1] != 'Asm4EE' or len(record) < 8:
+        return None
+    ( x, y, z, yaw, pitch, roll ) = record[2:8]
+    return App.Placement(App.Vector(x, y, z), App.Rotation(yaw, pitch, roll))
+
+
+# the offsets are compared as they're stored
+TOLERANCE = 1.0e-7
+
+def sameValues(a, b):
+    return len(a) == len(b) and all( abs(x-y) < TOLERANCE for x, y in zip(a, b) )
+
+
+# what restoring the records changes: ( obj, visibility, offset ) for each
+# object that differs, visibility and offset are None if they don't change
+def configurationChanges(records, objects):
+    changes = []
+    missing = []
+    for obj in objects:
+        objName = GetObjectName(obj)
+        record = records.get(objName)
+        if record is None:
+            missing.append(objName)
+            continue
+        visible = None
+        if bool(obj.Visibility) != record[0]:
+            visible = record[0]
+        offset = recordOffset(record)
+        if offset and sameValues(makeRecord(obj)[2:8], record[2:8]):
+            offset = None
+        if visible is not None or offset is not None:
+            changes.append( (obj, visible, offset) )
+    if missing:
+        printMissing(records, missing)
+    return changes
+
+
+# spreadsheet configurations stored the objects with the same alias in the
+# same row, so the data of all but one of them were lost
+def printMissing(records, missing):
+    collisions = findAliasCollisions(list(records) + missing)
+    for objName in missing:
+        message = 'No data for object "' + objName + '"'
+        others = [ name for name in collisions.get(GetValidAlias(objName), []) if name in records ]
+        if others:
+            message += ', its spreadsheet alias is the same as "' + others[0] + '"'
+        FCC.PrintMessage(message + '\n')
+
+
+def setVisibility(obj, visible):
+    obj.Visibility = visible
+
+
+# restores the records on the objects: only what differs is changed, in
+# one transaction, and only the objects that moved are recomputed, with
+# those attached to them. Returns the changed objects, or None if the
+# assembly has circular or dangling attachments, see solverLib.checkAssembly,
+# in which case nothing is changed
+def applyConfiguration(records, objects, doc, setVisibility=setVisibility):
+    changes = configurationChanges(records, objects)
+    if not changes:
+        return []
+    if solverLib.checkAssembly(doc):
+        return None
+    moved = []
+    doc.openTransaction('Restore configuration')
+    try:
+        for ( obj, visible, offset ) in changes:
+            if visible is not None:
+                setVisibility(obj, visible)
+            if offset is not None:
+                obj.AttachmentOffset = offset
+                moved.append(obj)
+        if moved and solverLib.updateObjects(doc, moved) is None:
+            doc.abortTransaction()
+            return None
+    except:
+        doc.abortTransaction()
+        raise
+    doc.commitTransaction()
+    return [ change[0] for change in changes ]
+
+
+# the rows of a spreadsheet configuration, found with one read of the name column
+def readSheetConfiguration(conf):
+    records = {}
+    for objName, row in GetSheetIndex(conf).items():
+        record = [ str(conf.get(OBJECT_VISIBLE_COL + row)) in ('True', '1'),
+                   str(conf.get(OBJECT_ASM_TYPE_COL + row)) ]
+        if record[1] == 'Asm4EE':
+            for col in ( OFFSET_POS_X_COL, OFFSET_POS_Y_COL, OFFSET_POS_Z_COL,
+                         OFFSET_ROT_YAW_COL, OFFSET_ROT_PITCH_COL, OFFSET_ROT_ROLL_COL ):
+                record.append(float(conf.get(col + row)))
+        records[objName] = record
+    return records
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |          variants of files, in batch          |
+    +-----------------------------------------------+
+"""
+# the file of the variant of fileName in a configuration: file.name.FCStd
+# next to it or in directory, or exported in another format
+def variantFileName(fileName, name, fileFormat='FCStd', directory=None):
+    base = os.path.splitext(os.path.basename(fileName))[0]
+    return os.path.join(directory or os.path.dirname(fileName), base + '.' + name + '.' + fileFormat)
+
+
+def writeVariant(doc, model, fileName):
+    if fileName.lower().endswith('.fcstd'):
+        # the original file is left as it is
+        doc.saveCopy(fileName)
+    else:
+        # only what's visible in the configuration, whatever the user's
+        # preference for exporting hidden objects is
+        import Import
+        Import.export([ model ], fileName, exportHidden=False)
+
+
+# batch task, see batchLib: applies each configuration to the file, and
+# writes the result as a variant. Without configurations, all of them
+def variantTask(job):
+    import batchLib
+    ( doc, loaded ) = batchLib.openDocument(job['file'])
+    written = []
+    missing = []
+    refused = []
+    errors = []
+    try:
+        model = doc.getObject('Model')
+        if model is None:
+            return { 'status': 'error', 'message': 'no Model in this document' }
+        names = job.get('configurations') or [ conf.Name for conf in listConfigurations(doc) ]
+        objects = list(configurationObjects(model))
+        # the state of the file, so that each variant starts from it and
+        # doesn't depend on the variants written before
+        baseline = { GetObjectName(obj): makeRecord(obj) for obj in objects }
+        for name in names:
+            conf = getConfig(name, 'Configurations', doc)
+            if conf is None:
+                missing.append(name)
+                continue
+            records = dict(baseline)
+            records.update(readConfiguration(conf))
+            if applyConfiguration(records, objects, doc) is None:
+                refused.append(name)
+                errors = solverLib.checkAssembly(doc)
+                continue
+            fileName = variantFileName(job['file'], name, job.get('format', 'FCStd'), job.get('output'))
+            writeVariant(doc, model, fileName)
+            written.append(fileName)
+    finally:
+        batchLib.closeDocuments(loaded)
+    message = str(len(written)) + ' variants written'
+    if missing:
+        message += ', no configuration ' + ', '.join(missing)
+    if refused:
+        message += ', not solved ' + ', '.join(refused) + ': ' + '; '.join(errors)
+    return { 'status': 'error' if missing or refused else 'ok', 'message': message, 'variants': written }
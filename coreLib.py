@@ -0,0 +1,680 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# coreLib.py
+#
+# the part of the Assembly 4 libraries that doesn't need the GUI: data model,
+# Placement expressions, traversal of Parts and Links. It only imports
+# FreeCAD, so that it can be used from FreeCADCmd and in batch workers.
+# Everything here is also available as Asm4.xxx through libAsm4
+
+
+
+"""
+    +-----------------------------------------------+
+    |          shouldn't these be DEFINE's ?        |
+    +-----------------------------------------------+
+"""
+
+import os
+from contextlib import contextmanager
+wbPath   = os.path.dirname(__file__)
+iconPath = os.path.join( wbPath, 'Resources/icons' )
+libPath  = os.path.join( wbPath, 'Resources/library' )
+
+import FreeCAD as App
+from FreeCAD import Console as FCC
+
+import cacheLib
+import profilerLib
+
+
+
+# Types of datum objects
+datumTypes = [  'PartDesign::CoordinateSystem', \
+                'PartDesign::Plane',            \
+                'PartDesign::Line',             \
+                'PartDesign::Point']
+
+
+partInfo =[     'PartID',                       \
+                'PartName',                     \
+                'PartDescription',              \
+                'PartSupplier']
+
+containerTypes = [  'App::Part', 'PartDesign::Body' ]
+
+
+
+
+# the first link pointing to obj in the document (by default the active one)
+def findObjectLink(obj, doc = None):
+    if doc is None:
+        doc = App.ActiveDocument
+    links = cacheLib.links.linksTo( obj, doc )
+    if links:
+        return links[0]
+    return(None)
+
+
+# all the links pointing to obj, in all open documents
+def findObjectLinks( obj ):
+    return cacheLib.links.linksTo( obj )
+
+
+def getSelectionPath(docName, objName, subObjName):
+        val = []
+        if (docName is None) or (docName == ''):
+            docName = App.ActiveDocument.Name
+        val.append(docName)
+        if objName and (objName != ''):
+            val.append(objName)
+            if subObjName and (subObjName != ''):
+                for son in subObjName.split('.'):
+                    if son and (son != ''):
+                        val.append(son)
+        
+        return val
+
+
+"""
+    +-----------------------------------------------+
+    |     batch several recomputes into only one    |
+    +-----------------------------------------------+
+"""
+# the objects to recompute at the end of the current deferredRecompute() block
+deferredObjects = None
+
+# usage:
+# with Asm4.deferredRecompute( doc, 'Clone fasteners' ):
+#     for ...:
+#         Asm4.placeObjectToLCS( ... )
+#
+# the helpers called inside the block don't recompute anything, the touched
+# objects are collected and recomputed once at the end, and all the changes
+# are in a single undo transaction
+@contextmanager
+def deferredRecompute( doc, name='Assembly4' ):
+    global deferredObjects
+    # nested blocks are part of the outer one
+    if deferredObjects is not None:
+        yield deferredObjects
+        return
+    deferredObjects = []
+    doc.openTransaction( name )
+    try:
+        yield deferredObjects
+        for obj in deferredObjects:
+            if obj.Document:
+                obj.touch()
+        profilerLib.recomputeDocument( doc )
+    except:
+        deferredObjects = None
+        doc.abortTransaction()
+        raise
+    deferredObjects = None
+    doc.commitTransaction()
+
+
+# recompute the object, its container and its document,
+# or collect it if we are in a deferredRecompute() block
+def recomputeObject( obj ):
+    if deferredObjects is not None:
+        deferredObjects.append( obj )
+        return
+    profilerLib.recompute( obj )
+    container = obj.getParentGeoFeatureGroup()
+    if container:
+        profilerLib.recompute( container )
+    if obj.Document:
+        profilerLib.recomputeDocument( obj.Document )
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |           Object helper functions           |
+    +-----------------------------------------------+
+"""
+
+def cloneObject(obj):
+    container = obj.getParentGeoFeatureGroup()
+    result = None
+    if obj.Document and container:
+        #result = obj.Document.copyObject(obj, False)
+        result = obj.Document.addObject('App::Link', obj.Name)
+        result.LinkedObject = obj
+        result.Label = obj.Label
+        container.addObject(result)
+        recomputeObject(result)
+    return result
+ 
+ 
+def placeObjectToLCS( attObj, attLink, attDoc, attLCS ):
+    expr = makeExpressionDatum( attLink, attDoc, attLCS )
+    # indicate the this fastener has been placed with the Assembly4 workbench
+    if not hasattr(attObj,'AssemblyType'):
+        makeAsmProperties(attObj)
+    attObj.AssemblyType = 'Asm4EE'
+    # the fastener is attached by its Origin, no extra LCS
+    attObj.AttachedBy = 'Origin'
+    # store the part where we're attached to in the constraints object
+    attObj.AttachedTo = attLink+'#'+attLCS
+    # load the built expression into the Expression field of the constraint
+    attObj.setExpression( 'Placement', expr )
+    # recompute the object to apply the placement:
+    recomputeObject(attObj)
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |      Create default Assembly4 properties      |
+    +-----------------------------------------------+
+"""
+def makeAsmProperties( obj, reset=False ):
+    # property AssemblyType
+    if not hasattr(obj,'AssemblyType'):
+        obj.addProperty( 'App::PropertyString', 'AssemblyType', 'Assembly' )
+    # property AttachedBy
+    if not hasattr(obj,'AttachedBy'):
+        obj.addProperty( 'App::PropertyString', 'AttachedBy', 'Assembly' )
+    # property AttachedTo
+    if not hasattr(obj,'AttachedTo'):
+        obj.addProperty( 'App::PropertyString', 'AttachedTo', 'Assembly' )
+    # property AttachmentOffset
+    if not hasattr(obj,'AttachmentOffset'):
+        obj.addProperty( 'App::PropertyPlacement', 'AttachmentOffset', 'Assembly' )
+    if reset:
+        obj.AssemblyType = ''
+        obj.AttachedBy = ''
+        obj.AttachedTo = ''
+        obj.AttachmentOffset = App.Placement()
+    return
+
+
+# checks whether there is an Asm4 Model in the active document
+def checkModel():
+    retval = None
+    if App.ActiveDocument and App.ActiveDocument.getObject('Model'):
+        model = App.ActiveDocument.getObject('Model')
+        if model.TypeId=='App::Part':
+            retval = model
+    return retval
+
+
+def isLinkToPart(obj):
+    if obj.TypeId == 'App::Link' and hasattr(obj.LinkedObject,'isDerivedFrom'):
+        if  obj.LinkedObject.isDerivedFrom('App::Part') or obj.LinkedObject.isDerivedFrom('PartDesign::Body'):
+            return True
+    else:
+        return False
+
+
+# get all datums in a part. The list is cached, until objects are added,
+# removed or moved to another group in that part
+def getPartLCS( part ):
+    cacheLib.watch()
+    partLCS = cacheLib.partDatums.get( part )
+    if partLCS is None:
+        groups = [ part ]
+        partLCS = findPartLCS( part, groups )
+        cacheLib.partDatums.store( part, partLCS, groups )
+    return list(partLCS)
+
+
+# walk the part and its groups, the visited groups are added to groups
+def findPartLCS( part, groups ):
+    partLCS = [ ]
+    # parse all objects in the part (they return strings)
+    for objName in part.getSubObjects(1):
+        # get the proper objects
+        # all object names end with a "." , this needs to be removed
+        obj = part.getObject( objName[0:-1] )
+        if obj.TypeId in datumTypes:
+            partLCS.append( obj )
+        elif obj.TypeId == 'App::DocumentObjectGroup':
+            groups.append( obj )
+            datums = findPartLCS( obj, groups )
+            for datum in datums:
+                partLCS.append(datum)
+    return partLCS
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |          walk the tree of an assembly         |
+    +-----------------------------------------------+
+"""
+# yields ( path, obj, linkedObj, depth, placement ) for root and all the
+# objects below it, depth first, in the order of the tree:
+#   path      : tuple of the object names from root to obj
+#   linkedObj : the object obj links to, or obj itself if it's not a link
+#   depth     : 0 for root, 1 for its children ...
+#   placement : the global Placement of obj if placements is True, else None
+#
+# accept( obj, linkedObj, depth )  : whether to yield this object (default all)
+# descend( obj, linkedObj, depth ) : whether to walk the children of linkedObj
+#                                    (default: containers, groups and links to them)
+# once : walk the children of each linked object only once, even if it's
+#        linked many times (the instances themselves are still all yielded)
+#
+# Only the current branch is kept in memory, and the caller can stop anytime
+#
+# usage:
+# for ( path, obj, linkedObj, depth, plc ) in Asm4.walkTree( model, accept=isDatum ):
+def walkTree( root, accept=None, descend=None, once=False, placements=False ):
+    if descend is None:
+        descend = isContainer
+    visited = set()
+    placement = None
+    if placements:
+        placement = getattr( root, 'Placement', App.Placement() )
+    branches = [ iter( [ (root, (root.Name,), 0, placement) ] ) ]
+    while branches:
+        item = next( branches[-1], None )
+        if item is None:
+            branches.pop()
+            continue
+        ( obj, path, depth, placement ) = item
+        linkedObj = obj.getLinkedObject(True)
+        if accept is None or accept( obj, linkedObj, depth ):
+            yield ( path, obj, linkedObj, depth, placement )
+        if descend( obj, linkedObj, depth ):
+            if once:
+                key = ( linkedObj.Document.Name, linkedObj.Name )
+                if key in visited:
+                    continue
+                visited.add(key)
+            branches.append( walkChildren( linkedObj, path, depth+1, placement ) )
+
+
+# the direct children of a container, for walkTree
+def walkChildren( container, path, depth, placement ):
+    for objName in container.getSubObjects(1):
+        # all object names end with a "." , this needs to be removed
+        obj = container.Document.getObject( objName[0:-1] )
+        if obj is None:
+            continue
+        objPlacement = None
+        if placement is not None:
+            objPlacement = placement
+            if hasattr(obj,'Placement'):
+                objPlacement = placement.multiply( obj.Placement )
+        yield ( obj, path+(obj.Name,), depth, objPlacement )
+
+
+# default descend rule of walkTree
+def isContainer( obj, linkedObj, depth ):
+    return linkedObj.TypeId in containerTypes or linkedObj.TypeId == 'App::DocumentObjectGroup'
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |           get the next instance's name         |
+    +-----------------------------------------------+
+"""
+def nextInstance( name, startAtOne=False, doc=None ):
+    if doc is None:
+        doc = App.ActiveDocument
+    # if there is no such name, return the original
+    if not doc.getObject(name) and not startAtOne:
+        return name
+    # there is already one, we increment
+    else:
+        if startAtOne:
+            instanceNum = 1
+        else:
+            instanceNum = 2
+        instanceNum = cacheLib.names.next( doc, name+'_', instanceNum )
+        return name+'_'+str(instanceNum)
+
+
+
+"""
+    +-----------------------------------------------+
+    |          return the ExpressionEngine          |
+    |           of the Placement property           |
+    +-----------------------------------------------+
+"""
+def placementEE( EE ):
+    if not EE:
+        return None
+    else:
+        for expr in EE:
+            if expr[0] == 'Placement':
+                return expr[1]
+    return None
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |     cached geometric properties of shapes     |
+    +-----------------------------------------------+
+"""
+# usage:
+# volume = Asm4.getShapeProperty( body, 'Volume' )
+# area   = Asm4.getShapeProperty( selObj, 'Area', 'Link.Body.Face3', subShape )
+#
+# the value is computed once for a given shape, and then read from the
+# cache as long as the shape doesn't change
+def getShapeProperty( obj, name, subName='', shape=None ):
+    if shape is None:
+        shape = obj.getSubObject(subName) if subName else obj.Shape
+    if shape.isNull():
+        return None
+    cacheLib.watch()
+    key = ( obj.Document.Name, obj.Name, subName )
+    return cacheLib.geometry.get( key, shape, name, shapeProperties[name] )
+
+
+# the center of mass of a shape, also for compounds of solids
+def centerOfMass( shape ):
+    if hasattr(shape,'CenterOfMass'):
+        return shape.CenterOfMass
+    solids = shape.Solids
+    volume = sum( [ solid.Volume for solid in solids ] )
+    if not solids or volume < 1.0e-12:
+        return shape.BoundBox.Center
+    center = App.Vector()
+    for solid in solids:
+        center += solid.CenterOfMass * ( solid.Volume / volume )
+    return center
+
+
+def matrixOfInertia( shape ):
+    if hasattr(shape,'MatrixOfInertia'):
+        return shape.MatrixOfInertia
+    return None
+
+
+# the properties that can be read with getShapeProperty
+shapeProperties = { 'BoundBox'        : lambda shape: shape.BoundBox,
+                    'Volume'          : lambda shape: shape.Volume,
+                    'Area'            : lambda shape: shape.Area,
+                    'CenterOfMass'    : centerOfMass,
+                    'MatrixOfInertia' : matrixOfInertia }
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |              some geometry tests              |
+    +-----------------------------------------------+
+"""
+def isVector( vect ):
+    if isinstance(vect,App.Vector):
+        return True
+    return False
+
+def isCircle(shape):
+    if shape.isValid()  and hasattr(shape,'Curve') \
+                        and shape.Curve.TypeId=='Part::GeomCircle' \
+                        and hasattr(shape.Curve,'Center') \
+                        and hasattr(shape.Curve,'Radius'):
+        return True
+    return False
+
+def isLine(shape):
+    if shape.isValid()  and hasattr(shape,'Curve') \
+                        and shape.Curve.TypeId=='Part::GeomLine' \
+                        and hasattr(shape,'Placement'):
+        return True
+    return False
+   
+def isSegment(shape):
+    if shape.isValid()  and hasattr(shape,'Curve') \
+                        and shape.Curve.TypeId=='Part::GeomLine' \
+                        and hasattr(shape,'Length') \
+                        and hasattr(shape,'Vertexes') \
+                        and len(shape.Vertexes)==2:
+        return True
+    return False
+
+
+def isFlatFace(shape):
+    if shape.isValid()  and hasattr(shape,'Area')   \
+                        and shape.Area > 1.0e-6     \
+                        and hasattr(shape,'Volume') \
+                        and shape.Volume < 1.0e-9:
+        return True
+    return False
+
+
+def isHoleAxis(obj):
+    if not obj:
+        return False
+    if hasattr(obj, 'AttacherType'):
+        if obj.AttacherType == 'Attacher::AttachEngineLine':
+            return True
+    return False
+
+
+def isPart(obj):
+    if not obj:
+        return False
+    if hasattr(obj, 'TypeId'):
+        if obj.TypeId == 'App::Part':
+            return True
+    return False
+
+
+def isAppLink(obj):
+    if not obj:
+        return False
+    if hasattr(obj, 'TypeId'):
+        if obj.TypeId == 'App::Link':
+            return True
+    return False
+    
+
+"""
+    +-----------------------------------------------+
+    |         the 3 base rotation Placements        |
+    +-----------------------------------------------+
+"""
+rotX = App.Placement( App.Vector(0,0,0), App.Rotation( App.Vector(1,0,0), 90. ) )
+rotY = App.Placement( App.Vector(0,0,0), App.Rotation( App.Vector(0,1,0), 90. ) )
+rotZ = App.Placement( App.Vector(0,0,0), App.Rotation( App.Vector(0,0,1), 90. ) )
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |         returns the object Name (Label)       |
+    +-----------------------------------------------+
+"""
+def nameLabel( obj ):
+    if obj:
+        txt = obj.Name
+        if obj.Name!=obj.Label:
+            txt += ' ('+obj.Label+')'
+        return txt
+    else:
+        return None
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |         populate the ExpressionEngine         |
+    |             for a linked App::Part            |
+    +-----------------------------------------------+
+"""
+def makeExpressionPart( attLink, attDoc, attLCS, linkedDoc, linkLCS ):
+    # if everything is defined
+    if attLink and attLCS and linkedDoc and linkLCS:
+        # this is where all the magic is, see:
+        # 
+        # https://forum.freecadweb.org/viewtopic.php?p=278124#p278124
+        #
+        # as of FreeCAD v0.19 the syntax is different:
+        # https://forum.freecadweb.org/viewtopic.php?f=17&t=38974&p=337784#p337784
+        # expr = ParentLink.Placement * ParentPart#LCS.Placement * constr_LinkName.AttachmentOffset * LinkedPart#LCS.Placement ^ -1
+        # expr = LCS_in_the_assembly.Placement * constr_LinkName.AttachmentOffset * LinkedPart#LCS.Placement ^ -1
+        # the AttachmentOffset is now a property of the App::Link
+        # expr = LCS_in_the_assembly.Placement * AttachmentOffset * LinkedPart#LCS.Placement ^ -1
+        expr = attLCS+'.Placement * AttachmentOffset * '+linkedDoc+'#'+linkLCS+'.Placement ^ -1'
+        # if we're attached to another sister part (and not the Parent Assembly)
+        # we need to take into account the Placement of that Part.
+        if attDoc:
+            expr = attLink+'.Placement * '+attDoc+'#'+expr
+    else:
+        expr = False
+    return expr
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |  split the ExpressionEngine of a linked part  |
+    |          to find the old attachment LCS       |
+    |   (in the parent assembly or a sister part)   |
+    |   and the old target LCS in the linked Part   |
+    +-----------------------------------------------+
+"""
+def splitExpressionLink( expr, parent ):
+    # same document:
+    # expr = LCS_target.Placement * AttachmentOffset * LCS_attachment.Placement ^ -1
+    # external document:
+    # expr = LCS_target.Placement * AttachmentOffset * linkedPart#LCS_attachment.Placement ^ -1
+    # expr = sisterLink.Placement * sisterPart#LCS_target.Placement * AttachmentOffset * linkedPart#LCS_attachment.Placement ^ -1
+    retval = ( expr, 'None', 'None' )
+    restFinal = ''
+    attLink = ''
+    # expr is empty
+    if not expr:
+        return retval
+    nbHash = expr.count('#')
+    if nbHash==0:
+        # linked part, sister part and assembly in the same document
+        if parent == 'Parent Assembly':
+            # we're attached to an LCS in the parent assembly
+            # expr = LCS_in_the_assembly.Placement * AttachmentOffset * LCS_linkedPart.Placement ^ -1
+            ( attLCS, separator, rest1 ) = expr.partition('.Placement * AttachmentOffset * ')
+            ( linkLCS, separator, rest2 ) = rest1.partition('.Placement ^ ')
+            restFinal = rest2[0:2]
+            attLink = parent
+            attPart = 'None'
+        else:
+            # we're attached to an LCS in a sister part
+            # expr = ParentLink.Placement * LCS_parent.Placement * AttachmentOffset * LCS_linkedPart.Placement ^ -1
+            ( attLink,    separator, rest1 ) = expr.partition('.Placement * ')
+            ( attLCS,     separator, rest2 ) = rest1.partition('.Placement * AttachmentOffset * ')
+            ( linkLCS,    separator, rest3 ) = rest2.partition('.Placement ^ ')
+            restFinal = rest3[0:2]
+    elif nbHash==1:
+        # an external part is linked to the assembly or a part in the same document as the assembly
+        if parent == 'Parent Assembly':
+            # we're attached to an LCS in the parent assembly
+            # expr = LCS_assembly.Placement * AttachmentOffset * LinkedPart#LCS.Placement ^ -1'			
+            ( attLCS, separator, rest1 ) = expr.partition('.Placement * AttachmentOffset * ')
+            ( linkedDoc, separator, rest2 ) = rest1.partition('#')
+            ( linkLCS, separator, rest3 ) = rest2.partition('.Placement ^ ')
+            restFinal = rest3[0:2]
+            attLink = parent
+            attPart = 'None'
+    elif nbHash==2:
+        # linked part and sister part in external documents to the parent assembly:
+        # expr = ParentLink.Placement * ParentPart#LCS.Placement * AttachmentOffset * LinkedPart#LCS.Placement ^ -1'			
+        ( attLink,    separator, rest1 ) = expr.partition('.Placement * ')
+        ( attPart,    separator, rest2 ) = rest1.partition('#')
+        ( attLCS,     separator, rest3 ) = rest2.partition('.Placement * AttachmentOffset * ')
+        ( linkedDoc, separator, rest4 ) = rest3.partition('#')
+        ( linkLCS,    separator, rest5 ) = rest4.partition('.Placement ^ ')
+        restFinal = rest5[0:2]
+    else:
+        # complicated stuff, we'll do it later
+        pass        
+    # final check, all options should give the correct data
+    if restFinal=='-1' and attLink==parent :
+        # wow, everything went according to plan
+        # retval = ( expr, attPart, attLCS, constrLink, partLCS )
+        retval = ( attLink, attLCS, linkLCS )
+    return retval
+
+
+
+"""
+    +-----------------------------------------------+
+    |         populate the ExpressionEngine         |
+    |               for a Datum object              |
+    |       linked to an LCS in a sister part       |
+    +-----------------------------------------------+
+"""
+def makeExpressionDatum( attLink, attPart, attLCS ):
+    # check that everything is defined
+    if attLink and attLCS:
+        # expr = Link.Placement * LinkedPart#LCS.Placement
+        expr = attLCS +'.Placement * AttachmentOffset'
+        if attPart:
+            expr = attLink+'.Placement * '+attPart+'#'+expr
+    else:
+        expr = False
+    return expr
+
+
+"""
+    +-----------------------------------------------+
+    |           split the ExpressionEngine          |
+    |        of a linked Datum object to find       |
+    |         the old attachment Part and LCS       |
+    +-----------------------------------------------+
+"""
+def splitExpressionDatum( expr ):
+    retval = ( expr, 'None', 'None' )
+    # expr is empty
+    if not expr:
+        return retval
+    restFinal = ''
+    attLink = ''
+    if expr:
+        # Look for a # to see whether the linked part is in the same document
+        # expr = Link.Placement * LinkedPart#LCS.Placement * AttachmentOffset
+        # expr = Link.Placement * LCS.Placement * AttachmentOffset
+        if '#' in expr:
+            # the linked part is in another document
+            # expr = Link.Placement * LinkedPart#LCS.Placement * AttachmentOffset
+            ( attLink, separator, rest1 ) = expr.partition('.Placement * ')
+            ( attPart, separator, rest2 ) = rest1.partition('#')
+            ( attLCS,  separator, rest3 ) = rest2.partition('.Placement * ')
+            restFinal = rest3[0:16]
+        else:
+            # the linked part is in the same document
+            # expr = Link.Placement * LCS.Placement * AttachmentOffset
+            ( attLink, separator, rest1 ) =  expr.partition('.Placement * ')
+            ( attLCS,  separator, rest2 ) = rest1.partition('.Placement * ')
+            restFinal = rest2[0:16]
+            attPart = 'unimportant'
+        if restFinal=='AttachmentOffset':
+            # wow, everything went according to plan
+            retval = ( attLink, attPart, attLCS )
+            #self.expression.setText( attPart +'***'+ attLCS )
+        else:
+            # rats ! But still, if the decode is unsuccessful, put some text
+            retval = ( restFinal, 'None', 'None' )
+    return retval
+
+
+
+"""
+    +-----------------------------------------------+
+    |        ExpressionEngine for Fasteners         |
+    +-----------------------------------------------+
+"""
+# is in the FastenersLib.py file
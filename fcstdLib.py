@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# fcstdLib.py
+#
+# reads the objects of a .FCStd file without opening it in FreeCAD: the
+# Document.xml inside the zip is read with a streaming parser, and only
+# what's needed for the structure of an assembly is kept. The result is
+# cached on disk, and read again only when the file has changed
+#
+# usage:
+#   data = fcstdLib.getDocument( 'asm.FCStd' )
+#   data['objects']['Model']    # { 'type', 'strings', 'group', 'link', 'shape' }
+#   fcstdLib.getGeometry( 'part.FCStd', 'Body' )   # needs the Part module
+#   fcstdLib.flush()            # writes the geometry read since to the cache
+#
+# this file only needs FreeCAD to read the geometry
+
+
+
+import os, json, hashlib, zipfile
+import xml.etree.ElementTree as ET
+
+
+
+"""
+    +-----------------------------------------------+
+    |                Global variables               |
+    +-----------------------------------------------+
+"""
+# where the cache files are
+cacheDirectory = os.environ.get( 'ASM4_CACHE' ) or \
+                 os.path.join( os.path.expanduser('~'), '.cache', 'Asm4' )
+
+# changes when the content of the cache files changes
+cacheVersion = 1
+
+# file name -> data, for the files already read by this process
+documents = {}
+
+# file names of the documents whose geometry isn't in the cache file yet
+changed = set()
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |          read Document.xml in the zip         |
+    +-----------------------------------------------+
+"""
+# object name -> { 'type', 'strings', 'group', 'link', 'shape' } where:
+#   strings : the values of the string properties (Label, Label2, PartInfo ...)
+#   group   : the names of the objects in its Group property
+#   link    : [ file, name ] of its LinkedObject, file is '' in the same document
+#   shape   : the name of the BRep file of its Shape in the zip
+#
+# each object is dropped from the XML tree as soon as it's read
+def readObjects( fileName ):
+    objects = {}
+    obj  = None
+    prop = None
+    with zipfile.ZipFile( fileName ) as archive:
+        with archive.open( 'Document.xml' ) as f:
+            for ( event, elem ) in ET.iterparse( f, events=('start','end') ):
+                tag = elem.tag
+                if event == 'end':
+                    if tag == 'Property':
+                        prop = None
+                    elif tag == 'Object' and obj is not None:
+                        obj = None
+                        elem.clear()
+                    continue
+                if tag == 'Object':
+                    name = elem.get('name')
+                    # the object list gives the types, the object data the properties
+                    if elem.get('type'):
+                        objects[name] = newObject( elem.get('type') )
+                    else:
+                        obj = objects.setdefault( name, newObject('') )
+                elif obj is None:
+                    continue
+                elif tag == 'Property':
+                    prop = elem.get('name')
+                elif tag == 'String' and prop:
+                    obj['strings'][prop] = elem.get('value','')
+                elif tag == 'Link' and prop == 'Group':
+                    obj['group'].append( elem.get('value') )
+                elif tag == 'XLink' and prop == 'LinkedObject':
+                    obj['link'] = [ elem.get('file',''), elem.get('name') ]
+                elif tag == 'Part' and prop == 'Shape' and elem.get('file'):
+                    obj['shape'] = elem.get('file')
+    return objects
+
+
+def newObject( typeId ):
+    return { 'type': typeId, 'strings': {}, 'group': [], 'link': None, 'shape': None }
+
+
+# the name FreeCAD gives to the document of a file. With unique, a short
+# hash of the full path is added, for files with the same name in
+# different directories
+def documentName( fileName, unique=False ):
+    name = os.path.splitext( os.path.basename(fileName) )[0]
+    name = ''.join( [ c if c.isalnum() else '_' for c in name ] )
+    if not name or name[0].isdigit():
+        name = '_'+name
+    if unique:
+        path = os.path.abspath( fileName )
+        name += '_'+hashlib.sha1( path.encode('utf-8') ).hexdigest()[0:8]
+    return name
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |        the objects, cached by file date       |
+    +-----------------------------------------------+
+"""
+def getDocument( fileName ):
+    fileName = os.path.abspath( fileName )
+    stat  = os.stat( fileName )
+    stamp = [ stat.st_mtime, stat.st_size ]
+    data = documents.get( fileName )
+    if data is None or data['stamp'] != stamp:
+        data = readCache( fileName )
+        if data is None or data['stamp'] != stamp:
+            data = { 'version': cacheVersion, 'file': fileName, 'stamp': stamp, \
+                     'objects': readObjects( fileName ), 'geometry': {} }
+            writeCache( data )
+        documents[fileName] = data
+    return data
+
+
+def cacheFile( fileName ):
+    key = hashlib.sha1( fileName.encode('utf-8') ).hexdigest()
+    return os.path.join( cacheDirectory, key+'.json' )
+
+
+def readCache( fileName ):
+    try:
+        with open( cacheFile(fileName) ) as f:
+            data = json.load( f )
+    except ( OSError, ValueError ):
+        return None
+    if data.get('version') != cacheVersion or data.get('file') != fileName:
+        return None
+    return data
+
+
+# the cache is only an optimisation, it's fine if it can't be written
+def writeCache( data ):
+    try:
+        os.makedirs( cacheDirectory, exist_ok=True )
+        fileName = cacheFile( data['file'] )
+        with open( fileName+'.tmp', 'w' ) as f:
+            json.dump( data, f )
+        os.replace( fileName+'.tmp', fileName )
+    except OSError:
+        pass
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |          geometry, only when asked for        |
+    +-----------------------------------------------+
+"""
+# { 'xLength', 'yLength', 'zLength', 'volume' } of the stored shape of an
+# object, or None if it has none. Only this shape is read from the zip
+def getGeometry( fileName, objName ):
+    data = getDocument( fileName )
+    if objName not in data['geometry']:
+        shapeFile = data['objects'].get( objName, {} ).get( 'shape' )
+        data['geometry'][objName] = readGeometry( data['file'], shapeFile )
+        changed.add( data['file'] )
+    return data['geometry'][objName]
+
+
+def readGeometry( fileName, shapeFile ):
+    # binary shapes would need a temporary file, they're not read
+    if not shapeFile or not shapeFile.lower().endswith('.brp'):
+        return None
+    import Part
+    with zipfile.ZipFile( fileName ) as archive:
+        brep = archive.read( shapeFile ).decode( 'utf-8', 'replace' )
+    shape = Part.Shape()
+    shape.importBrepFromString( brep, False )
+    if shape.isNull():
+        return None
+    bb = shape.BoundBox
+    geometry = { 'xLength': bb.XLength, 'yLength': bb.YLength, 'zLength': bb.ZLength, 'volume': '' }
+    try:
+        geometry['volume'] = shape.Volume
+    except Exception:
+        pass
+    return geometry
+
+
+# writes the geometry read since the last flush to the cache
+def flush():
+    for fileName in changed:
+        if fileName in documents:
+            writeCache( documents[fileName] )
+    changed.clear()
@@ -15,6 +15,7 @@ import FreeCAD as App
 from FreeCAD import Console as FCC
 
 import libAsm4 as Asm4
+import selectionLib
 
 
 
@@ -46,13 +47,13 @@ class importDatumCmd():
                 }
 
     def IsActive(self):
-        if App.ActiveDocument and Asm4.getSelectedDatum():
+        if App.ActiveDocument and selectionLib.getSelectedDatum():
             return True
         return False
 
     def Activated(self):
         # check that our selection is correct
-        ( link, datum ) = Asm4.getLinkAndDatum()
+        ( link, datum ) = selectionLib.getLinkAndDatum()
         if not link :
             Asm4.warningBox( 'The selected datum object cannot be imported into this assembly' )
         else :
@@ -67,7 +68,7 @@ class importDatumCmd():
 """
 class importDatumUI():
     def __init__(self):
-        ( link, datum ) = Asm4.getLinkAndDatum()
+        ( link, datum ) = selectionLib.getLinkAndDatum()
         if link :
             self.targetDatum = datum
             self.targetLink  = link
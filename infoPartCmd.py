@@ -16,6 +16,7 @@ import FreeCAD as App
 from FreeCAD import Console as FCC
 
 import libAsm4 as Asm4
+import selectionLib
 
 
 
@@ -56,7 +57,7 @@ class infoPartCmd():
 
     def IsActive(self):
         # We only insert a link into an Asm4  Model
-        if App.ActiveDocument and checkPart():
+        if App.ActiveDocument and selectionLib.cached( 'part', checkPart ):
             return True
         return False
 
@@ -13,6 +13,7 @@ import FreeCADGui as Gui
 import FreeCAD as App
 
 import libAsm4 as Asm4
+import cacheLib
 
 
 
@@ -135,11 +136,13 @@ class insertLink( QtGui.QDialog ):
                 self.partList.setCurrentItem(partFound[0])
                 # set the proposed name to a duplicate of the original link name
                 origName = self.origLink.Label
-                # if the last character is a number, we increment this number
-                lastChar = origName[-1]
-                if lastChar.isnumeric():
-                    rootName = origName[:-1]
-                    instanceNum = int(lastChar)
+                # if the name ends with a number, we increment this number
+                numbered = cacheLib.numberedName.match( origName )
+                if numbered:
+                    rootName = numbered.group(1)
+                    instanceNum = int( numbered.group(2) ) + 1
+                    instanceNum = cacheLib.names.next( App.ActiveDocument, rootName, instanceNum )
+                    # the counters know the names, this is a Label
                     while App.ActiveDocument.getObject( rootName+str(instanceNum) ):
                         instanceNum += 1
                     proposedLinkName = rootName+str(instanceNum)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# interpolationLib.py
+#
+# moves an assembly smoothly between saved configurations: the offsets of
+# all the objects in all the configurations are read once into arrays, and
+# the intermediate offsets are computed for all the objects together,
+# linearly for the positions and by quaternion slerp for the rotations
+#
+# usage:
+#   frames = interpolationLib.configurationFrames( [ 'closed', 'open' ], doc )
+#   frames.apply( 0.5 )                  # half-way, t goes from 0 to 1 here
+#   interpolationLib.exportFrames( frames, '/tmp/frames.csv', 50 )
+#
+# this file doesn't import any GUI module, so that it can also be used
+# from FreeCADCmd
+
+
+
+import csv
+
+import numpy as np
+
+import FreeCAD as App
+
+import configurationLib
+import placementLib
+import solverLib
+
+
+
+"""
+    +-----------------------------------------------+
+    |          the configurations as arrays         |
+    +-----------------------------------------------+
+"""
+class configurationFrames():
+    # the key frames are the configurations, in that order. t goes from 0
+    # at the first one to len(names)-1 at the last one
+    def __init__( self, names, doc=None ):
+        if doc is None:
+            doc = App.ActiveDocument
+        self.doc = doc
+        self.names = list(names)
+        if len(self.names) < 2:
+            raise ValueError( 'at least 2 configurations are needed' )
+        keys = [ configurationLib.readConfiguration( getConfiguration(name, doc) ) for name in self.names ]
+        model = doc.getObject('Model')
+        # only the objects placed by Asm4EE in all the configurations move
+        self.objects = []
+        # the objects whose visibility is stored, and their visibility
+        self.visibleObjects = []
+        self.visible = []
+        offsets = []
+        for obj in configurationLib.configurationObjects( model ):
+            objName = configurationLib.GetObjectName(obj)
+            records = [ key.get(objName) for key in keys ]
+            if any( record is None for record in records ):
+                continue
+            self.visibleObjects.append( obj )
+            self.visible.append( [ record[0] for record in records ] )
+            if all( record[1] == 'Asm4EE' and len(record) >= 8 for record in records ):
+                self.objects.append( obj )
+                offsets.append( [ record[2:8] for record in records ] )
+        # ( objects, keys ) -> ( keys, objects )
+        self.visible = np.array( self.visible, dtype=bool ).reshape( -1, len(keys) ).T
+        offsets = np.array( offsets, dtype=float ).reshape( -1, len(keys), 6 ).transpose( 1, 0, 2 )
+        self.positions = offsets[:,:,0:3]
+        self.quaternions = eulerToQuaternions( offsets[:,:,3:6] )
+        # each key on the same side as the previous one, for the shortest path
+        for k in range( 1, len(keys) ):
+            flip = np.sum( self.quaternions[k] * self.quaternions[k-1], axis=1 ) < 0
+            self.quaternions[k][flip] *= -1
+
+
+    # (N,7) array of [ x, y, z, qx, qy, qz, qw ] of the moving objects at t
+    def frame( self, t ):
+        t = min( max( t, 0.0 ), len(self.names)-1.0 )
+        k = min( int(t), len(self.names)-2 )
+        u = t - k
+        data = np.empty( (len(self.objects), 7) )
+        data[:,0:3] = ( 1-u ) * self.positions[k] + u * self.positions[k+1]
+        data[:,3:7] = slerp( self.quaternions[k], self.quaternions[k+1], u )
+        return data
+
+
+    # (F,N,7) array of count frames, evenly spaced from the first to the last configuration
+    def frames( self, count ):
+        steps = np.linspace( 0.0, len(self.names)-1.0, count )
+        return np.stack( [ self.frame(t) for t in steps ] )
+
+
+    # moves the assembly to t: the objects are visible as in the nearest
+    # configuration, and only the moving objects are recomputed
+    def apply( self, t, setVisibility=configurationLib.setVisibility ):
+        placements = placementLib.arrayToPlacements( self.frame(t) )
+        for obj, plc in zip( self.objects, placements ):
+            obj.AttachmentOffset = plc
+        nearest = int( round( min( max( t, 0.0 ), len(self.names)-1.0 ) ) )
+        for obj, visible in zip( self.visibleObjects, self.visible[nearest].tolist() ):
+            if bool(obj.Visibility) != visible:
+                setVisibility( obj, visible )
+        return solverLib.updateObjects( self.doc, self.objects )
+
+
+
+def getConfiguration( name, doc ):
+    conf = configurationLib.getConfig( name, 'Configurations', doc )
+    if conf is None:
+        raise ValueError( 'no configuration '+name+' in '+doc.Name )
+    return conf
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |          rotations, for many at once          |
+    +-----------------------------------------------+
+"""
+# quaternions [ qx, qy, qz, qw ] of yaw, pitch, roll angles in degrees,
+# like App.Rotation( yaw, pitch, roll ), for arrays of any shape (...,3)
+def eulerToQuaternions( angles ):
+    half = np.radians( angles ) / 2
+    ( cy, cp, cr ) = ( np.cos(half[...,0]), np.cos(half[...,1]), np.cos(half[...,2]) )
+    ( sy, sp, sr ) = ( np.sin(half[...,0]), np.sin(half[...,1]), np.sin(half[...,2]) )
+    return np.stack( ( sr*cp*cy - cr*sp*sy,
+                       cr*sp*cy + sr*cp*sy,
+                       cr*cp*sy - sr*sp*cy,
+                       cr*cp*cy + sr*sp*sy ), axis=-1 )
+
+
+# spherical interpolation between the (N,4) quaternions q0 and q1, at u
+def slerp( q0, q1, u ):
+    dot = np.sum( q0 * q1, axis=1 )
+    q1 = np.where( (dot < 0)[:,None], -q1, q1 )
+    dot = np.clip( np.abs(dot), 0.0, 1.0 )
+    theta = np.arccos( dot )
+    sin = np.sin( theta )
+    # almost the same rotation: linear interpolation is as good, and safe
+    close = sin < 1.0e-6
+    sin[close] = 1.0
+    a = np.where( close, 1-u, np.sin( (1-u)*theta ) / sin )
+    b = np.where( close, u,   np.sin( u*theta ) / sin )
+    q = a[:,None] * q0 + b[:,None] * q1
+    return q / np.linalg.norm( q, axis=1 )[:,None]
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                 export frames                 |
+    +-----------------------------------------------+
+"""
+# one row per frame and moving object: frame, object, x, y, z, qx, qy, qz, qw
+def exportFrames( frames, fileName, count ):
+    data = frames.frames( count )
+    names = [ configurationLib.GetObjectName(obj) for obj in frames.objects ]
+    with open( fileName, 'w', newline='' ) as f:
+        writer = csv.writer( f )
+        writer.writerow( [ 'frame', 'object', 'x', 'y', 'z', 'qx', 'qy', 'qz', 'qw' ] )
+        for i, frame in enumerate( data.tolist() ):
+            for name, values in zip( names, frame ):
+                writer.writerow( [ i, name ] + values )
+    return len(data)
@@ -7,7 +7,7 @@
 
 
 
-import os
+import os, threading
 
 from PySide import QtGui, QtCore
 import FreeCADGui as Gui
@@ -15,6 +15,8 @@ import FreeCAD as App
 from FreeCAD import Console as FCC
 
 import libAsm4 as Asm4
+import bomLib
+import massLib
 
 
 
@@ -161,6 +163,8 @@ with open('/tmp/table.csv', 'w') as csvfile:
 class makeBOM:
     def __init__(self):
         super(makeBOM,self).__init__()
+        # the BOM is kept between two uses, and follows the changes of the documents
+        self.bomTable = None
 
     def GetResources(self):
         return {"MenuText": "Create Part List",
@@ -181,78 +185,47 @@ class makeBOM:
         self.drawUI()
         self.UI.show()
         self.BOM.clear()
-        self.PartsList = ''
-        self.listParts(self.model)
+        # identical parts are counted, with their quantity per sub-assembly.
+        # The volumes are computed in parallel only when they're exported
+        if self.bomTable and self.bomTable.valid and self.bomTable.root == bomLib.partKey(self.model):
+            self.bomTable.refresh()
+        else:
+            if self.bomTable:
+                self.bomTable.stop()
+            self.bomTable = bomLib.bomTable( self.model, volumes=False )
+            self.bomTable.follow()
+        self.PartsList = self.bomTable.formatText( self.modelDoc.Name )
         self.BOM.setPlainText(self.PartsList)
+        # the changes made while the dialog is open are shown
+        self.timer = QtCore.QTimer( self.UI )
+        self.timer.timeout.connect( self.onRefresh )
+        self.timer.start( 1000 )
+        self.UI.finished.connect( self.timer.stop )
 
 
-    def listParts( self, obj, level=0 ):
-        indent = '\n'+'\t'*level
-        if obj.Document == self.modelDoc:
-            docName = ''
-        else:
-            docName = obj.Document.Name+'#'
-        #partBB = App.BoundBox()
-        # list the Variables
-        if obj.Name=='Variables':
-            #print(indent+'Variables:')
-            self.PartsList += indent+'Variables:'
-            for prop in obj.PropertiesList:
-                if obj.getGroupOfProperty(prop)=='Variables' :
-                    propValue = obj.getPropertyByName(prop)
-                    self.PartsList += indent+'\t'+prop+' = '+str(propValue)
-        # if it's part we look for sub-objects
-        elif obj.TypeId=='App::Part':
-            self.PartsList += indent +docName +obj.Label
-            for objname in obj.getSubObjects():
-                subobj = obj.Document.getObject( objname[0:-1] )
-                self.listParts( subobj, level+1 )
-        # if its a link, look for the linked object
-        elif obj.TypeId=='App::Link':
-            self.PartsList += indent+obj.Label+' -> '
-            self.listParts( obj.LinkedObject, level )
-        # if its a Body container we also add the document name and the size
-        elif obj.TypeId=='PartDesign::Body':
-            self.PartsList += indent +docName +obj.Label
-            if obj.Label2:
-                self.PartsList += ' ('+obj.Label2+')'
-            bb = obj.Shape.BoundBox
-            if abs(max(bb.XLength,bb.YLength,bb.ZLength)) < 1e+10:
-                Xsize = str(int((bb.XLength * 10)+0.099)/10)
-                Ysize = str(int((bb.YLength * 10)+0.099)/10)
-                Zsize = str(int((bb.ZLength * 10)+0.099)/10)
-                self.PartsList += ', Size: '+Xsize+' x '+Ysize+' x '+Zsize
-        # everything else except datum objects
-        elif obj.TypeId not in Asm4.datumTypes:
-            self.PartsList += indent+obj.Label
-            if obj.Label2:
-                self.PartsList += ' ('+obj.Label2+')'
-            else:
-                self.PartsList += ' ('+obj.TypeId+')'
-            # if the object has a shape, add it at the end of the line
-            if hasattr(obj,'Shape') and obj.Shape.BoundBox.isValid():
-                bb = obj.Shape.BoundBox
-                if max(bb.XLength,bb.YLength,bb.ZLength) < 1e+10:
-                    Xsize = str(int((bb.XLength * 10)+0.099)/10)
-                    Ysize = str(int((bb.YLength * 10)+0.099)/10)
-                    Zsize = str(int((bb.ZLength * 10)+0.099)/10)
-                    self.PartsList += ', Size: '+Xsize+' x '+Ysize+' x '+Zsize
-        return
+    def onRefresh(self):
+        """Updates the changed rows of the BOM"""
+        if self.bomTable.refresh():
+            self.PartsList = self.bomTable.formatText( self.modelDoc.Name )
+            self.BOM.setPlainText(self.PartsList)
 
 
     def onSave(self):
-        #pass
-        """Saves ASCII tree to user system file"""
-        _path = QtGui.QFileDialog.getSaveFileName()
+        """Saves the BOM to a CSV, JSON, JSON Lines or text file"""
+        _path = QtGui.QFileDialog.getSaveFileName( None, 'Save BOM', '', \
+                    'CSV (*.csv);;Tab separated (*.tsv);;JSON (*.json);;JSON Lines (*.jsonl);;Text (*.txt)' )
         if _path[0]:
-            save_file = QtCore.QFile(_path[0])
-            if save_file.open(QtCore.QFile.ReadWrite):
-                save_fileContent = QtCore.QTextStream(save_file)
-                save_fileContent << self.BOM
-                save_file.flush()
-                save_file.close()
+            try:
+                if _path[0].lower().endswith('.txt'):
+                    with open( _path[0], 'w' ) as f:
+                        f.write( self.PartsList )
+                elif self.computeMass():
+                    bomLib.exportBOM( self.model, _path[0], bom=self.bomTable )
+                else:
+                    self.BOM.setPlainText("Cancelled")
+                    return
                 self.BOM.setPlainText("Saved to file : " + _path[0])
-            else:
+            except OSError:
                 #FCC.PrintError("ERROR : Can't open file : "+ _path[0]+'\n')
                 self.BOM.setPlainText("ERROR : Can't open file : " + _path[0])
         else:
@@ -261,6 +234,41 @@ class makeBOM:
         #self.UI.close()
 
 
+    def onSheet(self):
+        """Writes the BOM into a Spreadsheet of the document"""
+        if not self.computeMass():
+            return
+        count = bomLib.exportBOM( self.model, bom=self.bomTable )
+        self.BOM.setPlainText("Written "+str(count)+" rows to the BOM spreadsheet")
+        QtCore.QTimer.singleShot(3000, lambda:self.BOM.setPlainText(self.PartsList))
+
+
+    def computeMass(self):
+        """Computes the mass properties of the parts in worker processes"""
+        # only those never computed, or read again since
+        if not self.bomTable.staleMass:
+            return True
+        mass = massLib.massProperties( self.bomTable )
+        progressDialog = QtGui.QProgressDialog( 'Computing the mass properties of ' \
+                            +str(len(mass.shapes))+' parts', 'Cancel', 0, max(len(mass.shapes),1), self.UI )
+        progressDialog.setWindowModality( QtCore.Qt.WindowModal )
+        cancel = threading.Event()
+        state = { 'done': 0 }
+        def progress( done, total ):
+            state['done'] = done
+        # the GUI stays responsive while the workers run
+        worker = threading.Thread( target=mass.run, args=( progress, cancel ) )
+        worker.start()
+        while worker.is_alive():
+            if progressDialog.wasCanceled():
+                cancel.set()
+            progressDialog.setValue( state['done'] )
+            QtGui.QApplication.processEvents()
+            worker.join( 0.05 )
+        progressDialog.close()
+        return mass.merge()
+
+
     def isReal( bb ):
         # check if the BoundingBox is a real one
         if bb.isValid() and abs(max(bb.XLength,bb.YLength,bb.ZLength)) < 1e+10:
@@ -317,8 +325,11 @@ class makeBOM:
         self.CopyButton = QtGui.QPushButton('Copy')
         self.buttonLayout.addWidget(self.CopyButton)
         # Save button
-        #self.SaveButton = QtGui.QPushButton('Save')
-        #self.buttonLayout.addWidget(self.SaveButton)
+        self.SaveButton = QtGui.QPushButton('Save')
+        self.buttonLayout.addWidget(self.SaveButton)
+        # Spreadsheet button
+        self.SheetButton = QtGui.QPushButton('Spreadsheet')
+        self.buttonLayout.addWidget(self.SheetButton)
         # OK button
         self.OkButton = QtGui.QPushButton('Close')
         self.OkButton.setDefault(True)
@@ -330,7 +341,8 @@ class makeBOM:
 
         # Actions
         self.CopyButton.clicked.connect(self.onCopy)
-        #self.SaveButton.clicked.connect(self.onSave)
+        self.SaveButton.clicked.connect(self.onSave)
+        self.SheetButton.clicked.connect(self.onSheet)
         self.OkButton.clicked.connect(self.onOK)
 
 # add the command to the workbench
@@ -13,6 +13,7 @@ import FreeCAD as App
 import Part, Draft
 
 import libAsm4 as asm4
+import selectionLib
 
 
 
@@ -35,7 +36,7 @@ class newLinkArray():
     def IsActive(self):
         if App.ActiveDocument:
             # Only active when a App::Link is selected
-            selectObj = self.checkPart()
+            selectObj = selectionLib.cached( 'arrayObject', self.checkPart )
             if selectObj:
                 return (True)
         else:
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# massLib.py
+#
+# computes the volume, area, center of mass and inertia of the parts of a
+# BOM in parallel: the shape of each different part is written once as
+# BRep, and FreeCADCmd workers, which only need Part, read these files
+# and compute the properties. The results are merged into the BOM table.
+# Only the parts of bom.staleMass are computed: all of them the first time,
+# then those read again since, when the documents changed
+#
+# usage:
+#   bom = bomLib.bomTable( model, volumes=False )
+#   massLib.computeMassProperties( bom, progress=f, cancel=threading.Event() )
+# or, to run the workers in another thread than the GUI:
+#   mass = massLib.massProperties( bom )     # GUI thread
+#   mass.run( progress, cancel )             # any thread
+#   mass.merge()                             # GUI thread
+#
+# this file doesn't import any GUI module
+
+
+
+import os, shutil, tempfile
+
+from FreeCAD import Console as FCC
+
+import batchLib
+import bomLib
+import coreLib
+
+
+
+"""
+    +-----------------------------------------------+
+    |                Global variables               |
+    +-----------------------------------------------+
+"""
+# a worker process computes at most this many parts, so that the
+# progress is reported often enough
+chunkSize = 20
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                  Master side                  |
+    +-----------------------------------------------+
+"""
+class massProperties():
+    # the shapes are exported here, FreeCAD objects can only be read from
+    # the main thread
+    def __init__( self, bom, workers=None, command=None ):
+        self.bom = bom
+        self.workers = workers or os.cpu_count() or 1
+        # without FreeCADCmd, merge() computes all the parts, one after the other
+        try:
+            self.command = command or batchLib.findFreeCADCmd()
+        except FileNotFoundError as e:
+            FCC.PrintWarning( str(e)+', the mass properties are computed without workers\n' )
+            self.command = None
+        self.directory = tempfile.mkdtemp( prefix='asm4_mass_' )
+        # BRep file name -> part key
+        self.shapes = {}
+        # part key -> its row when exported, the row is replaced if the part
+        # is read again in the meantime
+        self.rows = {}
+        # BRep file name -> computed properties
+        self.results = {}
+        self.cancelled = False
+        self.exportShapes()
+
+
+    def exportShapes( self ):
+        for key in self.bom.staleMass & set(self.bom.parts):
+            # its document may have been closed since the BOM was made
+            obj = bomLib.getObject( key )
+            shape = getattr( obj, 'Shape', None )
+            if shape is None or shape.isNull():
+                # nothing to compute
+                self.bom.staleMass.discard( key )
+                continue
+            self.rows[key] = self.bom.parts[key]
+            name = str(len(self.shapes))+'.brep'
+            # the BRep is too big for the job itself, it goes into a file
+            with open( os.path.join(self.directory, name), 'w' ) as f:
+                f.write( shape.exportBrepToString() )
+            self.shapes[name] = key
+
+
+    # the jobs for the workers, at least one per worker if there are enough parts
+    def makeJobs( self ):
+        names = list(self.shapes)
+        count = max( self.workers, ( len(names) + chunkSize - 1 ) // chunkSize )
+        count = min( count, len(names) )
+        return [ { 'task': 'massLib.massTask', 'directory': self.directory, \
+                   'shapes': names[i::count] } for i in range(count) ]
+
+
+    # progress is called with ( parts done, parts total ). Setting cancel,
+    # a threading.Event, kills the running workers
+    def run( self, progress=None, cancel=None ):
+        if self.command is None:
+            return
+        total = len(self.shapes)
+        def jobDone( result, done, jobs ):
+            self.results.update( result.get('parts', {}) )
+            if progress:
+                progress( len(self.results), total )
+        batchLib.runJobs( self.makeJobs(), workers=self.workers, command=self.command, \
+                          progress=jobDone, cancel=cancel )
+        self.cancelled = cancel is not None and cancel.is_set()
+
+
+    # the results go into the BOM table. Parts that a worker couldn't
+    # compute are computed here, unless the computation was cancelled
+    def merge( self ):
+        for ( name, key ) in self.shapes.items():
+            # not if the part was read again, or forgotten, since
+            if self.bom.parts.get(key) is not self.rows[key]:
+                continue
+            data = self.results.get(name)
+            if data is None:
+                if self.cancelled:
+                    continue
+                obj = bomLib.getObject( key )
+                if obj is None:
+                    continue
+                data = shapeData( obj.Shape, obj )
+            self.bom.parts[key].update( formatData(data) )
+            self.bom.staleMass.discard( key )
+        shutil.rmtree( self.directory, ignore_errors=True )
+        return not self.cancelled
+
+
+
+# all in one, returns False if it was cancelled
+def computeMassProperties( bom, workers=None, command=None, progress=None, cancel=None ):
+    mass = massProperties( bom, workers, command )
+    try:
+        mass.run( progress, cancel )
+    finally:
+        done = mass.merge()
+    return done
+
+
+# as they are in the BOM rows
+def formatData( data ):
+    row = { 'volume': round( data['volume'], 3 ), 'area': round( data['area'], 3 ) }
+    row['centerOfMass'] = tuple( [ round(x,3) for x in data['centerOfMass'] ] )
+    row['inertia'] = ''
+    if data['inertia']:
+        row['inertia'] = tuple( [ round(x,3) for x in data['inertia'] ] )
+    return row
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                  Worker side                  |
+    +-----------------------------------------------+
+"""
+# the properties of a shape, as JSON values. If obj is given, they're
+# read through the geometry cache
+def shapeData( shape, obj=None ):
+    if obj is None:
+        read = lambda name: coreLib.shapeProperties[name](shape)
+    else:
+        read = lambda name: coreLib.getShapeProperty( obj, name, shape=shape )
+    center = read('CenterOfMass')
+    data = { 'volume': read('Volume'), 'area': read('Area'), \
+             'centerOfMass': [ center.x, center.y, center.z ], 'inertia': None }
+    m = read('MatrixOfInertia')
+    if m is not None:
+        # it's symmetric
+        data['inertia'] = [ m.A11, m.A12, m.A13, m.A22, m.A23, m.A33 ]
+    return data
+
+
+# batch task, see batchLib: computes the properties of the BRep files
+def massTask( job ):
+    import Part
+    parts = {}
+    for name in job['shapes']:
+        shape = Part.Shape()
+        with open( os.path.join(job['directory'], name) ) as f:
+            shape.importBrepFromString( f.read(), False )
+        parts[name] = shapeData( shape )
+    return { 'status': 'ok', 'message': str(len(parts))+' parts', 'parts': parts }
@@ -16,6 +16,7 @@ import FreeCAD as App
 import Part
 
 import libAsm4 as Asm4
+import selectionLib
 
 
 
@@ -76,7 +77,7 @@ class newDatum:
     def IsActive(self):
         if App.ActiveDocument:
             # is something correct selected ?
-            if self.checkSelection():
+            if selectionLib.cached( 'datumContainer', self.checkSelection ):
                 return(True)
         return(False)
 
@@ -161,7 +162,7 @@ class newHole:
                 }
 
     def IsActive(self):
-        selection = self.getSelectedEdge()
+        selection = selectionLib.cached( 'circularEdge', self.getSelectedEdge )
         if selection == None:
             return False
         else:
@@ -197,10 +198,8 @@ class newHole:
         # if the solid having the edge is indeed in an App::Part
         if parentPart and (parentPart.TypeId=='App::Part' or parentPart.TypeId=='PartDesign::Body'):
             # check whether there is already a similar datum, and increment the instance number 
-            instanceNum = 1
-            while App.ActiveDocument.getObject( 'HoleAxis_'+str(instanceNum) ):
-                instanceNum += 1
-            axis = parentPart.newObject('PartDesign::Line','HoleAxis_'+str(instanceNum))
+            axisName = Asm4.nextInstance( 'HoleAxis', startAtOne=True, doc=parentPart.Document )
+            axis = parentPart.newObject('PartDesign::Line',axisName)
             axis.Support = [( selectedObj, (edgeName,) )]
             axis.MapMode = 'AxisOfCurvature'
             axis.MapReversed = False
@@ -211,7 +210,7 @@ class newHole:
             '''
             pt1    = App.Vector(0,0,diam/2.)
             pt2    = App.Vector(0,0,-diam/2.)
-            axis   = parentPart.newObject('Part::FeaturePython', 'HoleAxis_'+str(instanceNum))
+            axis   = parentPart.newObject('Part::FeaturePython', axisName)
             axis.ViewObject.Proxy = Asm4.setCustomIcon(axis,'Asm4_Hole.svg')
             axis.Shape = Part.Wire(Part.makeLine(pt1,pt2))
             axis.Placement = circle.Placement
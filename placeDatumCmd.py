@@ -14,6 +14,8 @@ import FreeCAD as App
 from FreeCAD import Console as FCC
 
 import libAsm4 as Asm4
+import selectionLib
+import profilerLib
 
 
 
@@ -46,7 +48,7 @@ class placeDatumCmd():
                 }
 
     def IsActive(self):
-        if App.ActiveDocument and Asm4.getSelectedDatum():
+        if App.ActiveDocument and selectionLib.getSelectedDatum():
             return True
         return False
 
@@ -199,7 +201,7 @@ class placeDatumUI():
             self.selectedDatum.setExpression('Placement', self.old_EE )
         if self.selectedDatum and self.selectedDatum.TypeId=='PartDesign::CoordinateSystem':
             self.selectedDatum.ViewObject.ShowLabel = False
-        self.selectedDatum.recompute()
+        profilerLib.recompute( self.selectedDatum )
         # highlight the selected LCS in its new position
         Gui.Selection.clearSelection()
         Gui.Selection.addSelection( self.activeDoc.Name, 'Model', self.selectedDatum.Name +'.')
@@ -254,7 +256,7 @@ class placeDatumUI():
             # recompute the object to apply the placement:
             self.selectedDatum.ViewObject.ShowLabel = True
             self.selectedDatum.ViewObject.FontSize = 20
-            self.selectedDatum.recompute()
+            profilerLib.recompute( self.selectedDatum )
             # highlight the selected LCS in its new position
             Gui.Selection.clearSelection()
             Gui.Selection.addSelection( self.activeDoc.Name, 'Model', self.selectedDatum.Name +'.')
@@ -316,7 +318,7 @@ class placeDatumUI():
     # Rotataions
     def rotAxis( self, addRotation ):
         self.selectedDatum.AttachmentOffset = self.selectedDatum.AttachmentOffset.multiply(addRotation) 
-        self.selectedDatum.recompute()
+        profilerLib.recompute( self.selectedDatum )
 
     def onRotX(self):
         self.rotAxis(Asm4.rotX)
@@ -12,6 +12,9 @@ import FreeCAD as App
 from FreeCAD import Console as FCC
 
 import libAsm4 as Asm4
+import selectionLib
+import profilerLib
+import solverLib
 
 
 
@@ -50,7 +53,7 @@ class placeLinkCmd():
 
     def IsActive(self):
         # We only insert a link into an Asm4  Model
-        if App.ActiveDocument and Asm4.getSelectedLink() :
+        if App.ActiveDocument and selectionLib.getSelectedLink() :
             return True
         return False
 
@@ -279,7 +282,7 @@ class placeLinkUI():
             self.selectedLink.AttachmentOffset = self.old_AO
         if self.old_EE:
             self.selectedLink.setExpression( 'Placement', self.old_EE )
-        self.selectedLink.recompute()
+        profilerLib.recompute( self.selectedLink )
         # highlight in the 3D window the object we placed
         self.finish()
 
@@ -351,6 +354,11 @@ class placeLinkUI():
             
         # check that all of them have something in
         # constrName has been checked at the beginning
+        # attaching to a part that is itself attached to the selected link would never solve
+        if a_Link and a_Link != 'Parent Assembly':
+            if solverLib.makesLoop( self.selectedLink, self.activeDoc.getObject(a_Link) ):
+                FCC.PrintError( 'Circular attachment: '+a_Link+' depends on '+self.selectedLink.Name+'\n' )
+                return False
         if a_Link and a_LCS and l_Part and l_LCS :
             # this is where all the magic is, see:
             # 
@@ -370,9 +378,9 @@ class placeLinkUI():
             self.selectedLink.AttachedTo = a_Link+'#'+a_LCS
             # load the expression into the link's Expression Engine
             self.selectedLink.setExpression('Placement', expr )
-            # recompute the object to apply the placement:
-            self.selectedLink.recompute()
-            self.parentAssembly.recompute(True)
+            # apply the placement, to the link and what's attached to it
+            self.solveLink()
+            profilerLib.recompute( self.parentAssembly )
             return True
         else:
             #FCC.PrintWarning("Problem in selections\n")
@@ -482,7 +490,14 @@ class placeLinkUI():
         rotationZ = App.Placement( App.Vector(0.00, 0.00, 0.00), App.Rotation( App.Vector(0,0,1), self.ZrotationAngle - self.old_LinkRotation.toEuler()[2] ))
 
         self.selectedLink.AttachmentOffset = moveXYZ * rotationX * rotationY * rotationZ
-        self.selectedLink.recompute()
+        self.solveLink()
+
+
+    # the solver resolves the LCS of the expression only once for all the
+    # changes, see cacheLib.lcsPlacements. FreeCAD does it if the solver can't
+    def solveLink( self ):
+        if solverLib.updateObjects( self.activeDoc, [ self.selectedLink ] ) is None:
+            profilerLib.recompute( self.selectedLink )
 
         
     def onXTranslValChanged(self):
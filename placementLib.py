@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# placementLib.py
+#
+# compiles the Placement expressions written by Assembly4 into chains
+# of 4x4 matrices, and evaluates them for many objects at once with NumPy
+#
+# this file doesn't import any GUI module, so that it can also be used
+# from FreeCADCmd
+
+
+
+import re
+import numpy as np
+
+import FreeCAD as App
+
+import cacheLib
+
+
+
+"""
+    +-----------------------------------------------+
+    |                Global variables               |
+    +-----------------------------------------------+
+"""
+# compiled expressions, by expression string
+compiledExpressions = {}
+
+# the terms of an Asm4 expression:
+# LCS.Placement, Doc#LCS.Placement, AttachmentOffset, each optionally followed by ^ -1
+placementTerm = re.compile( r'^(?:(\w+)#)?(\w+)\.Placement(\s*\^\s*-1)?$' )
+offsetTerm    = re.compile( r'^AttachmentOffset(\s*\^\s*-1)?$' )
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |       compile an Asm4 Placement expression    |
+    +-----------------------------------------------+
+"""
+# the known expressions are products of terms:
+# expr = LCS_in_the_assembly.Placement * AttachmentOffset * LinkedPart#LCS.Placement ^ -1
+# expr = ParentLink.Placement * ParentPart#LCS.Placement * AttachmentOffset * LinkedPart#LCS.Placement ^ -1
+# expr = Link.Placement * LinkedPart#LCS.Placement * AttachmentOffset
+#
+# they are compiled into a tuple of terms ( docName, objName, inverse ),
+# where docName is None for objects in the same document, and objName is
+# None for the AttachmentOffset of the object itself.
+# Returns None if the expression has another shape, it's then left to
+# FreeCAD's ExpressionEngine
+def compileExpression( expr ):
+    if not expr:
+        return None
+    if expr in compiledExpressions:
+        return compiledExpressions[expr]
+    chain = []
+    for term in expr.split('*'):
+        term = term.strip()
+        match = placementTerm.match(term)
+        if match:
+            ( docName, objName, inverse ) = match.groups()
+            chain.append( ( docName or None, objName, bool(inverse) ) )
+            continue
+        match = offsetTerm.match(term)
+        if match:
+            chain.append( ( None, None, bool(match.group(1)) ) )
+            continue
+        # not one of ours
+        chain = None
+        break
+    if chain:
+        chain = tuple(chain)
+    compiledExpressions[expr] = chain
+    return chain
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |       Placement <-> 4x4 matrix conversions    |
+    +-----------------------------------------------+
+"""
+# (N,7) array of [ x, y, z, qx, qy, qz, qw ] from a list of Placements
+def placementsToArray( placements ):
+    data = np.empty( (len(placements), 7) )
+    for i, plc in enumerate(placements):
+        data[i,0:3] = ( plc.Base.x, plc.Base.y, plc.Base.z )
+        data[i,3:7] = plc.Rotation.Q
+    return data
+
+
+# (N,4,4) matrices from an (N,7) array of positions and quaternions
+def arrayToMatrices( data ):
+    ( x, y, z, w ) = ( data[:,3], data[:,4], data[:,5], data[:,6] )
+    mats = np.zeros( (len(data), 4, 4) )
+    mats[:,0,0] = 1 - 2*(y*y + z*z)
+    mats[:,0,1] = 2*(x*y - z*w)
+    mats[:,0,2] = 2*(x*z + y*w)
+    mats[:,1,0] = 2*(x*y + z*w)
+    mats[:,1,1] = 1 - 2*(x*x + z*z)
+    mats[:,1,2] = 2*(y*z - x*w)
+    mats[:,2,0] = 2*(x*z - y*w)
+    mats[:,2,1] = 2*(y*z + x*w)
+    mats[:,2,2] = 1 - 2*(x*x + y*y)
+    mats[:,0:3,3] = data[:,0:3]
+    mats[:,3,3] = 1.0
+    return mats
+
+
+# (N,7) array of positions and quaternions from (N,4,4) matrices
+def matricesToArray( mats ):
+    m = mats
+    data = np.empty( (len(mats), 7) )
+    data[:,0:3] = m[:,0:3,3]
+    trace = m[:,0,0] + m[:,1,1] + m[:,2,2]
+    # Shepperd's method: use the largest of the 4 possible pivots
+    pivot = np.argmax( np.stack( (m[:,0,0], m[:,1,1], m[:,2,2], trace), axis=1 ), axis=1 )
+    q = np.empty( (len(mats), 4) )
+    # the trace is largest
+    i = pivot == 3
+    s = np.sqrt( 1.0 + trace[i] ) * 2
+    q[i] = np.stack( ( (m[i,2,1]-m[i,1,2])/s, (m[i,0,2]-m[i,2,0])/s, (m[i,1,0]-m[i,0,1])/s, s/4 ), axis=1 )
+    # m00 is largest
+    i = pivot == 0
+    s = np.sqrt( 1.0 + m[i,0,0] - m[i,1,1] - m[i,2,2] ) * 2
+    q[i] = np.stack( ( s/4, (m[i,0,1]+m[i,1,0])/s, (m[i,0,2]+m[i,2,0])/s, (m[i,2,1]-m[i,1,2])/s ), axis=1 )
+    # m11 is largest
+    i = pivot == 1
+    s = np.sqrt( 1.0 + m[i,1,1] - m[i,0,0] - m[i,2,2] ) * 2
+    q[i] = np.stack( ( (m[i,0,1]+m[i,1,0])/s, s/4, (m[i,1,2]+m[i,2,1])/s, (m[i,0,2]-m[i,2,0])/s ), axis=1 )
+    # m22 is largest
+    i = pivot == 2
+    s = np.sqrt( 1.0 + m[i,2,2] - m[i,0,0] - m[i,1,1] ) * 2
+    q[i] = np.stack( ( (m[i,0,2]+m[i,2,0])/s, (m[i,1,2]+m[i,2,1])/s, s/4, (m[i,1,0]-m[i,0,1])/s ), axis=1 )
+    data[:,3:7] = q / np.linalg.norm( q, axis=1 )[:,None]
+    return data
+
+
+# the inverse of rigid transformations: [ R^T | -R^T.t ]
+def invertMatrices( mats ):
+    inv = np.zeros_like(mats)
+    rotT = np.transpose( mats[:,0:3,0:3], (0,2,1) )
+    inv[:,0:3,0:3] = rotT
+    inv[:,0:3,3] = -np.einsum( 'nij,nj->ni', rotT, mats[:,0:3,3] )
+    inv[:,3,3] = 1.0
+    return inv
+
+
+def arrayToPlacements( data ):
+    placements = []
+    for row in data.tolist():
+        placements.append( App.Placement( App.Vector(row[0], row[1], row[2]), \
+                                          App.Rotation(row[3], row[4], row[5], row[6]) ) )
+    return placements
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |      evaluate many compiled chains at once    |
+    +-----------------------------------------------+
+"""
+# evaluates the compiled chains of the objects. The objects must not depend
+# on each other, and the objects they depend on must be up-to-date.
+# known is a dict (docName,objName) -> 4x4 matrix, of already computed
+# Placements. It's also used as a cache for the Placements read here.
+# Returns an (N,4,4) array of the resulting Placements
+def evaluateChains( doc, objects, chains, known ):
+    # read all the Placements that aren't known yet, in one go
+    cacheLib.watch()
+    missing = []
+    missingObj = []
+    seen = set()
+    for obj, chain in zip(objects, chains):
+        for ( docName, objName, inverse ) in chain:
+            if objName is None:
+                continue
+            node = ( docName or doc.Name, objName )
+            if node not in known and node not in seen:
+                seen.add( node )
+                # LCS used by many instances are resolved only once
+                mat = cacheLib.lcsPlacements.get(node)
+                if mat is not None:
+                    known[node] = mat
+                    continue
+                source = getSource( doc, node )
+                if source is None:
+                    raise KeyError( 'Object '+node[0]+'#'+node[1]+' not found' )
+                missing.append( node )
+                missingObj.append( source )
+    if missing:
+        mats = arrayToMatrices( placementsToArray( [ o.Placement for o in missingObj ] ) )
+        for node, source, mat in zip( missing, missingObj, mats ):
+            known[node] = mat
+            if source.isDerivedFrom('Part::Datum'):
+                cacheLib.lcsPlacements.store( source, mat )
+    offsets = [ getattr(obj, 'AttachmentOffset', App.Placement()) for obj in objects ]
+    offsets = arrayToMatrices( placementsToArray(offsets) )
+    result = np.empty( (len(objects), 4, 4) )
+    # chains of the same length are multiplied together
+    byLength = {}
+    for i, chain in enumerate(chains):
+        byLength.setdefault( len(chain), [] ).append(i)
+    for length, indices in byLength.items():
+        stack = np.empty( (len(indices), length, 4, 4) )
+        inverse = np.zeros( (len(indices), length), dtype=bool )
+        for row, i in enumerate(indices):
+            for col, ( docName, objName, inv ) in enumerate(chains[i]):
+                if objName is None:
+                    stack[row,col] = offsets[i]
+                else:
+                    stack[row,col] = known[ (docName or doc.Name, objName) ]
+                inverse[row,col] = inv
+        if inverse.any():
+            stack[inverse] = invertMatrices( stack[inverse] )
+        product = stack[:,0]
+        for col in range(1, length):
+            product = np.matmul( product, stack[:,col] )
+        result[indices] = product
+    return result
+
+
+def getSource( doc, node ):
+    ( docName, objName ) = node
+    if docName != doc.Name:
+        doc = App.listDocuments().get(docName)
+        if doc is None:
+            return None
+    return doc.getObject(objName)
+
+
+# write the computed Placements back into the objects. Since their
+# expressions would give the same result, the objects are not left touched
+def writePlacements( objects, mats ):
+    placements = arrayToPlacements( matricesToArray(mats) )
+    for obj, plc in zip( objects, placements ):
+        obj.Placement = plc
+    for obj in objects:
+        obj.purgeTouched()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# profilerLib.py
+#
+# records the time spent recomputing each object during assembly updates
+# and placement commands, to find which link or part makes them slow. In
+# recursive and document recomputes, each object FreeCAD recomputes is
+# recorded, with the time since the previous one
+#
+# usage, from the Python console:
+#   import profilerLib
+#   profilerLib.enable()
+#   ... update the assembly, place some parts ...
+#   profilerLib.printReport()
+#   profilerLib.writeCSV('/tmp/recompute.csv')
+#   profilerLib.disable()
+#
+# it can also be enabled at startup (for example in batch workers) by
+# setting the ASM4_PROFILE environment variable
+#
+# this file doesn't import any GUI module, so that it can also be used
+# from FreeCADCmd
+
+
+
+import os, time, json, csv
+
+import FreeCAD as App
+from FreeCAD import Console as FCC
+
+
+
+"""
+    +-----------------------------------------------+
+    |                Global variables               |
+    +-----------------------------------------------+
+"""
+# when disabled, the instrumented calls only cost this test
+enabled = bool( os.environ.get('ASM4_PROFILE') )
+
+# (docName,objName) -> statistics of that object
+stats = {}
+
+# the document observer timing the objects of recursive recomputes
+observer = None
+
+fields = [ 'document', 'object', 'label', 'recomputes', 'recomputeTime', \
+           'expressions', 'expressionTime', 'totalTime' ]
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                runtime switch                 |
+    +-----------------------------------------------+
+"""
+def enable( clear=True ):
+    global enabled
+    if clear:
+        reset()
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    stats.clear()
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                instrumentation                |
+    +-----------------------------------------------+
+"""
+def getEntry( obj ):
+    key = ( obj.Document.Name, obj.Name )
+    entry = stats.get(key)
+    if entry is None:
+        entry = { 'document': key[0], 'object': key[1], 'label': obj.Label, \
+                  'recomputes': 0, 'recomputeTime': 0.0, \
+                  'expressions': 0, 'expressionTime': 0.0 }
+        stats[key] = entry
+    return entry
+
+
+def recordRecompute( obj, seconds ):
+    entry = getEntry(obj)
+    entry['recomputes']    += 1
+    entry['recomputeTime'] += seconds
+
+
+# FreeCAD tells when it has recomputed each object: while a recompute is
+# timed, the time since the previous object (or the start) is this object's
+class recomputeObserver():
+    def __init__(self):
+        # time of the last recomputed object, None when nothing is timed
+        self.last = None
+        self.count = 0
+
+    def slotRecomputedObject( self, obj ):
+        if self.last is None or not obj.Document:
+            return
+        now = time.perf_counter()
+        recordRecompute( obj, now - self.last )
+        self.last = now
+        self.count += 1
+
+
+def getObserver():
+    global observer
+    if observer is None:
+        observer = recomputeObserver()
+        App.addDocumentObserver(observer)
+    return observer
+
+
+# calls function(*args) and records the objects it recomputes. If FreeCAD
+# didn't report any, all the time goes to obj, if given
+def timed( obj, function, *args ):
+    watcher = getObserver()
+    # in a timed recompute, the outer one records the objects
+    if watcher.last is not None:
+        return function(*args)
+    start = time.perf_counter()
+    ( watcher.last, watcher.count ) = ( start, 0 )
+    try:
+        result = function(*args)
+    finally:
+        if watcher.count == 0 and obj is not None:
+            recordRecompute( obj, time.perf_counter() - start )
+        watcher.last = None
+    return result
+
+
+# use instead of obj.recompute(...) where the time should be recorded
+def recompute( obj, *args ):
+    if not enabled:
+        return obj.recompute(*args)
+    return timed( obj, obj.recompute, *args )
+
+
+# use instead of doc.recompute(), the time of each object is recorded
+def recomputeDocument( doc ):
+    if not enabled:
+        return doc.recompute()
+    return timed( None, doc.recompute )
+
+
+# records the evaluation of the Placement expressions of several objects,
+# done together in the given time: it's shared equally between them
+def recordExpressions( objects, seconds ):
+    if not enabled or not objects:
+        return
+    share = seconds / len(objects)
+    for obj in objects:
+        entry = getEntry(obj)
+        entry['expressions']    += 1
+        entry['expressionTime'] += share
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                    reports                    |
+    +-----------------------------------------------+
+"""
+# the statistics as a list of dicts, sorted by the given field, largest first
+def report( sortBy='totalTime', limit=None ):
+    rows = []
+    for entry in stats.values():
+        row = dict(entry)
+        row['totalTime'] = entry['recomputeTime'] + entry['expressionTime']
+        rows.append(row)
+    # names in alphabetical order, times and counts largest first
+    rows.sort( key=lambda r: r[sortBy], reverse=sortBy not in ('document','object','label') )
+    if limit:
+        rows = rows[0:limit]
+    return rows
+
+
+def printReport( sortBy='totalTime', limit=30 ):
+    rows = report( sortBy, limit )
+    if not rows:
+        FCC.PrintMessage( 'No recompute recorded\n' )
+        return
+    width = max( [ len(r['document']+'#'+r['object']) for r in rows ] + [6] )
+    text = 'Object'.ljust(width)+'  Recomputes  Recompute (ms)  Expressions  Expression (ms)  Total (ms)\n'
+    for r in rows:
+        text += (r['document']+'#'+r['object']).ljust(width)+'  ' \
+              + str(r['recomputes']).rjust(10)+'  '+('%14.2f' % (r['recomputeTime']*1000))+'  ' \
+              + str(r['expressions']).rjust(11)+'  '+('%15.2f' % (r['expressionTime']*1000))+'  ' \
+              + ('%10.2f' % (r['totalTime']*1000))+'\n'
+    total = sum( [ e['recomputeTime'] + e['expressionTime'] for e in stats.values() ] )
+    count = sum( [ e['recomputes'] for e in stats.values() ] )
+    text += str(len(stats))+' objects, '+str(count)+' recomputes, '+('%.1f' % (total*1000))+' ms\n'
+    FCC.PrintMessage( text )
+
+
+def writeCSV( fileName, sortBy='totalTime' ):
+    with open( fileName, 'w', newline='' ) as f:
+        writer = csv.DictWriter( f, fieldnames=fields )
+        writer.writeheader()
+        for row in report(sortBy):
+            writer.writerow(row)
+
+
+def writeJSON( fileName, sortBy='totalTime' ):
+    with open( fileName, 'w' ) as f:
+        json.dump( report(sortBy), f, indent=1 )
@@ -11,6 +11,7 @@ import FreeCAD as App
 import Part
 
 import libAsm4 as Asm4
+import selectionLib
 
 
 
@@ -37,7 +38,7 @@ class releaseAttachment:
         # is there an active document ?
         if App.ActiveDocument:
             # is something selected ?
-            selObj = self.checkSelection()
+            selObj = selectionLib.cached( 'attachedObject', self.checkSelection )
             if selObj != None:
                 return True
         return False 
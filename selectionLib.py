@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# selectionLib.py
+#
+# FreeCAD calls the IsActive() function of every toolbar command many times
+# per second. Instead of analysing the selection each time, the commands
+# ask this module, which analyses it only once after each selection change.
+# The results are also dropped when the documents change, since the
+# selected objects may have changed
+#
+# usage, in a command:
+#   def IsActive(self):
+#       if selectionLib.getSelectedLink():
+#           return True
+#       return False
+# or, for any other analysis of the selection:
+#   selectionLib.cached( 'fastener', getSelectionFS )
+
+
+
+import FreeCADGui as Gui
+import FreeCAD as App
+
+import libAsm4 as Asm4
+import cacheLib
+
+
+
+"""
+    +-----------------------------------------------+
+    |                Global variables               |
+    +-----------------------------------------------+
+"""
+# the selection observer, started on first use
+observer = None
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |      the selection, analysed only once        |
+    +-----------------------------------------------+
+"""
+class selectionState():
+    def __init__(self):
+        # name -> result of the analysis for the current selection
+        self.results = {}
+        # the results are also only valid for that document and Model
+        self.document = None
+
+    # the selection changed, all results are obsolete
+    def clear(self):
+        self.results = {}
+
+    # Selection observer callbacks
+    def addSelection( self, doc, obj, sub, pnt ):
+        self.clear()
+
+    def removeSelection( self, doc, obj, sub ):
+        self.clear()
+
+    def setSelection( self, doc ):
+        self.clear()
+
+    def clearSelection( self, doc ):
+        self.clear()
+
+    # Document observer callbacks, through cacheLib
+    def objectChanged( self, obj, prop ):
+        self.clear()
+
+    def objectDeleted( self, obj ):
+        self.clear()
+
+    def documentClosed( self, doc ):
+        self.clear()
+
+    def get( self, name, analyse ):
+        document = None
+        if App.ActiveDocument:
+            document = ( App.ActiveDocument.Name, Asm4.checkModel() is not None )
+        if document != self.document:
+            self.document = document
+            self.results = {}
+        if name not in self.results:
+            self.results[name] = analyse()
+        return self.results[name]
+
+
+
+def getState():
+    global observer
+    if observer is None:
+        observer = selectionState()
+        Gui.Selection.addObserver( observer )
+        cacheLib.addCache( observer )
+    return observer
+
+
+# the result of analyse() for the current selection, computed only once
+def cached( name, analyse ):
+    return getState().get( name, analyse )
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |         the usual analyses of Assembly4       |
+    +-----------------------------------------------+
+"""
+def getSelectedLink():
+    return cached( 'link', Asm4.getSelectedLink )
+
+
+def getSelectedDatum():
+    return cached( 'datum', Asm4.getSelectedDatum )
+
+
+def getSelectedContainer():
+    return cached( 'container', Asm4.getSelectedContainer )
+
+
+def getLinkAndDatum():
+    return cached( 'linkAndDatum', Asm4.getLinkAndDatum )
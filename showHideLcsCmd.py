@@ -9,10 +9,7 @@ import FreeCADGui as Gui
 import FreeCAD as App
 
 import libAsm4 as Asm4
-
-
-# Already processed links cache, no need to process the same part if its linked multiple times
-#processedLinks = []
+import selectionLib
 
 
 """
@@ -32,25 +29,20 @@ class showLcsCmd:
 
     def IsActive(self):
         # treats all container types : Body and Part
-        if Asm4.getSelectedContainer() or Asm4.checkModel() or Asm4.getSelectedLink():
+        if selectionLib.getSelectedContainer() or Asm4.checkModel() or selectionLib.getSelectedLink():
             return True
         return False
 
     def Activated(self):
-        #global processedLinks
-        # reset processed links cache
-        processedLinks = []
-
         #model = Asm4.getModelSelected()
-        container = Asm4.getSelectedContainer()
+        container = selectionLib.getSelectedContainer()
         if not container:
             container = Asm4.checkModel()
-        link = Asm4.getSelectedLink()
+        link = selectionLib.getSelectedLink()
         if link:
-            showChildLCSs(link, True, processedLinks)
+            showChildLCSs(link, True)
         elif container:
-            for objName in container.getSubObjects(1):
-                showChildLCSs(container.getSubObject(objName, 1), True, processedLinks)
+            showChildLCSs(container, True)
 
 
 """
@@ -70,24 +62,19 @@ class hideLcsCmd:
 
     def IsActive(self):
         # Will handle LCSs only for the Assembly4 model
-        if Asm4.getSelectedContainer() or Asm4.checkModel() or Asm4.getSelectedLink():
+        if selectionLib.getSelectedContainer() or Asm4.checkModel() or selectionLib.getSelectedLink():
             return True
         return False
 
     def Activated(self):
-        #global processedLinks
-        # reset processed links cache
-        processedLinks = []
-
-        container = Asm4.getSelectedContainer()
+        container = selectionLib.getSelectedContainer()
         if not container:
             container = Asm4.checkModel()
-        link = Asm4.getSelectedLink()
+        link = selectionLib.getSelectedLink()
         if link:
-            showChildLCSs(link, False, processedLinks)
+            showChildLCSs(link, False)
         elif container:
-            for objName in container.getSubObjects(1):
-                showChildLCSs(container.getSubObject(objName, 1), False, processedLinks)
+            showChildLCSs(container, False)
 
 
 
@@ -97,31 +84,20 @@ class hideLcsCmd:
     |   the provided object and all its children    |
     +-----------------------------------------------+
 """
-def showChildLCSs(obj, show, processedLinks):
-    #global processedLinks
-    # if its a datum apply the visibility
-    if obj.TypeId in Asm4.datumTypes:
-        obj.Visibility = show
-    # if it's a link, look for subObjects
-    elif obj.TypeId == 'App::Link' and obj.Name not in processedLinks:
-        processedLinks.append(obj.Name)
-        for objName in obj.LinkedObject.getSubObjects(1):
-            linkedObj = obj.LinkedObject.Document.getObject(objName[0:-1])
-            showChildLCSs(linkedObj, show, processedLinks)
-    # if it's a container
-    else:
-        if obj.TypeId in Asm4.containerTypes:
-            for subObjName in obj.getSubObjects(1):
-                subObj = obj.getSubObject(subObjName, 1)    # 1 for returning the real object
-                if subObj != None:
-                    if subObj.TypeId in Asm4.datumTypes:
-                        #subObj.Visibility = show
-                        # Aparently obj.Visibility API is very slow
-                        # Using the ViewObject.show() and ViewObject.hide() API runs at least twice faster
-                        if show:
-                            subObj.ViewObject.show()
-                        else:
-                            subObj.ViewObject.hide()
+# the datums of a part linked many times are the same objects,
+# so each linked part is walked only once
+def showChildLCSs(obj, show):
+    for ( path, datum, linkedObj, depth, plc ) in Asm4.walkTree( obj, accept=isDatum, once=True ):
+        # Aparently obj.Visibility API is very slow
+        # Using the ViewObject.show() and ViewObject.hide() API runs at least twice faster
+        if show:
+            datum.ViewObject.show()
+        else:
+            datum.ViewObject.hide()
+
+
+def isDatum( obj, linkedObj, depth ):
+    return obj.TypeId in Asm4.datumTypes
 
 
 
@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# solverLib.py
+#
+# builds the attachment graph of an Assembly4 Model and recomputes
+# its objects in dependency order
+#
+# this file doesn't import any GUI module, so that it can also be used
+# from FreeCADCmd
+
+
+
+import re, time
+from collections import deque
+
+import FreeCAD as App
+from FreeCAD import Console as FCC
+
+import cacheLib
+import placementLib
+import profilerLib
+
+
+
+"""
+    +-----------------------------------------------+
+    |                Global variables               |
+    +-----------------------------------------------+
+"""
+# the document observer tracking the changes since the last solve
+tracker = None
+
+# matches LCS.Placement and Doc#LCS.Placement in an ExpressionEngine
+placementRef = re.compile( r'(?:(\w+)#)?(\w+)\.Placement\b' )
+
+# changing these properties doesn't move anything
+ignoredProperties = [ 'Label', 'Label2', 'Visibility', 'Shape', 'Group', \
+                      'ViewObject', 'State' ]
+
+# changing these properties changes the structure of the graph
+structureProperties = [ 'ExpressionEngine', 'LinkedObject', 'AttachedTo', \
+                        'AttachedBy', 'Support', 'MapMode' ]
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |   find the objects a given object depends on  |
+    +-----------------------------------------------+
+"""
+# the Placement expression of an object, if any
+def placementExpression( obj ):
+    if hasattr(obj,'ExpressionEngine') and obj.ExpressionEngine:
+        for ( path, expr ) in obj.ExpressionEngine:
+            if path == 'Placement':
+                return expr
+    return None
+
+
+# returns the set of (docName,objName) nodes on which the placement of obj depends
+def getDependencies( obj ):
+    doc = obj.Document
+    deps = set()
+    # the Placement expression: LCS.Placement, Link.Placement and Doc#LCS.Placement
+    expr = placementExpression(obj)
+    if expr:
+        for ( docName, objName ) in placementRef.findall(expr):
+            if not docName:
+                docName = doc.Name
+            deps.add( (docName, objName) )
+    # the Asm4 properties, in case the expression couldn't be decoded
+    if hasattr(obj,'AttachedTo') and obj.AttachedTo:
+        ( parent, separator, attLCS ) = obj.AttachedTo.partition('#')
+        if parent == 'Parent Assembly' and attLCS:
+            deps.add( (doc.Name, attLCS) )
+        elif parent and attLCS:
+            deps.add( (doc.Name, parent) )
+            parentObj = doc.getObject(parent)
+            if parentObj and hasattr(parentObj,'LinkedObject') and parentObj.LinkedObject:
+                deps.add( (parentObj.LinkedObject.Document.Name, attLCS) )
+    # a link is attached by an LCS in its linked part ('#LCS'), a fastener by its 'Origin'
+    if hasattr(obj,'AttachedBy') and obj.AttachedBy.startswith('#'):
+        if hasattr(obj,'LinkedObject') and obj.LinkedObject:
+            deps.add( (obj.LinkedObject.Document.Name, obj.AttachedBy[1:]) )
+    # datum objects mapped by the Part attacher
+    if hasattr(obj,'Support') and obj.Support:
+        for ( supportObj, subNames ) in obj.Support:
+            deps.add( (supportObj.Document.Name, supportObj.Name) )
+    # objects never depend on themselves
+    deps.discard( (doc.Name, obj.Name) )
+    return deps
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |         the attachment graph of a document    |
+    +-----------------------------------------------+
+"""
+class AttachmentGraph():
+    def __init__(self, doc):
+        self.doc = doc
+        # nodes are (docName,objName) tuples, in the order of the document
+        self.nodes = []
+        # node -> set of nodes it depends on
+        self.upstream = {}
+        # node -> set of nodes that depend on it
+        self.downstream = {}
+        # the loops, found once for this graph by check()
+        self.loops = None
+        # problems found by the last check(), and what it couldn't check
+        self.errors = []
+        self.warnings = []
+        for obj in doc.Objects:
+            node = (doc.Name, obj.Name)
+            self.nodes.append(node)
+            deps = getDependencies(obj)
+            self.upstream[node] = deps
+            for dep in deps:
+                self.downstream.setdefault(dep, set()).add(node)
+
+
+    # all the nodes depending, directly or not, on the given nodes
+    def downstreamOf( self, nodes ):
+        found = set()
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            for child in self.downstream.get(node, ()):
+                if child not in found:
+                    found.add(child)
+                    stack.append(child)
+        return found
+
+
+    # sort the given nodes so that each one comes after the nodes it depends on
+    def sortNodes( self, nodes ):
+        nodes = set(nodes)
+        inDegree = {}
+        for node in nodes:
+            inDegree[node] = len( self.upstream.get(node, set()) & nodes )
+        # nodes of this document in document order, followed by the others
+        ready = deque( [ n for n in self.nodes if inDegree.get(n)==0 ] )
+        ready.extend( [ n for n in nodes if n not in self.upstream and inDegree[n]==0 ] )
+        ordered = []
+        while ready:
+            node = ready.popleft()
+            ordered.append(node)
+            for child in self.downstream.get(node, ()):
+                if child in inDegree:
+                    inDegree[child] -= 1
+                    if inDegree[child] == 0:
+                        ready.append(child)
+        # nodes in a dependency loop are left for the end
+        ordered.extend( [ n for n in self.nodes if inDegree.get(n,0) > 0 ] )
+        return ordered
+
+
+    # split sorted nodes into levels: nodes of a level only depend on nodes of previous levels
+    def levels( self, ordered ):
+        levelOf = {}
+        levels = []
+        for node in ordered:
+            level = 0
+            for dep in self.upstream.get(node, ()):
+                if dep in levelOf:
+                    level = max( level, levelOf[dep]+1 )
+            levelOf[node] = level
+            if level == len(levels):
+                levels.append([])
+            levels[level].append(node)
+        return levels
+
+
+    # analysis of the graph, before any recompute
+    #
+    # groups of nodes of this document that depend on each other in a loop
+    # (Tarjan's strongly connected components, without recursion)
+    def findLoops( self ):
+        index = {}
+        lowLink = {}
+        onStack = set()
+        stack = []
+        loops = []
+        counter = 0
+        for root in self.nodes:
+            if root in index:
+                continue
+            # each frame is a node and an iterator on the nodes it depends on
+            work = [ ( root, iter(self.upstream.get(root, ())) ) ]
+            index[root] = lowLink[root] = counter
+            counter += 1
+            stack.append(root)
+            onStack.add(root)
+            while work:
+                ( node, deps ) = work[-1]
+                pushed = False
+                for dep in deps:
+                    if dep not in self.upstream:
+                        # objects in other documents can't be part of a loop
+                        continue
+                    if dep not in index:
+                        index[dep] = lowLink[dep] = counter
+                        counter += 1
+                        stack.append(dep)
+                        onStack.add(dep)
+                        work.append( ( dep, iter(self.upstream.get(dep, ())) ) )
+                        pushed = True
+                        break
+                    elif dep in onStack:
+                        lowLink[node] = min( lowLink[node], index[dep] )
+                if pushed:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowLink[parent] = min( lowLink[parent], lowLink[node] )
+                if lowLink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        onStack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1:
+                        loops.append(component)
+        return loops
+
+
+    # (node, missing dependency) pairs, for objects placed relative to
+    # something that doesn't exist (anymore). The objects of documents that
+    # aren't loaded can't be checked, they're in the unloaded pairs
+    def findDangling( self ):
+        dangling = []
+        unloaded = []
+        docs = App.listDocuments()
+        for node in self.nodes:
+            for dep in self.upstream.get(node, ()):
+                if dep in self.upstream:
+                    continue
+                depDoc = docs.get(dep[0])
+                if depDoc is None:
+                    unloaded.append( (node, dep) )
+                elif depDoc.getObject(dep[1]) is None:
+                    dangling.append( (node, dep) )
+        return ( dangling, unloaded )
+
+
+    # error messages for the problems that would make a recompute fail.
+    # The loops only depend on this graph and are found once, the objects
+    # of other documents are looked for each time, since these documents
+    # can change, be opened or closed without rebuilding the graph. The
+    # attachments to documents that aren't loaded are only warnings
+    def check( self ):
+        if self.loops is None:
+            self.loops = []
+            for loop in self.findLoops():
+                names = [ self.nodeName(n) for n in loop ]
+                self.loops.append( 'Circular attachment between '+', '.join(sorted(names)) )
+        self.errors = list(self.loops)
+        self.warnings = []
+        ( dangling, unloaded ) = self.findDangling()
+        for ( node, dep ) in dangling:
+            self.errors.append( self.nodeName(node)+' is attached to '+dep[0]+'#'+dep[1]+', which doesn\'t exist' )
+        for ( node, dep ) in unloaded:
+            self.warnings.append( self.nodeName(node)+' is attached to '+dep[0]+'#'+dep[1]+', whose document isn\'t loaded' )
+        return self.errors
+
+
+    # Name (Label) of the object of a node of this document
+    def nodeName( self, node ):
+        obj = self.doc.getObject(node[1])
+        if obj and obj.Label != obj.Name:
+            return obj.Name+' ('+obj.Label+')'
+        return node[1]
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |   document observer tracking changed objects  |
+    +-----------------------------------------------+
+"""
+class changeTracker():
+    def __init__(self):
+        # a counter incremented for each change
+        self.sequence = 0
+        # docName -> { objName: sequence of its last change }, cleared when
+        # the document is solved
+        self.changed = {}
+        # docName -> sequence of the last change in the document
+        self.lastChange = {}
+        # docName -> sequence of the last solve of that document
+        self.solved = {}
+        # docName -> (sequence of the last structure change, cached graph)
+        self.structure = {}
+        self.graphs = {}
+
+
+    def slotChangedObject( self, obj, prop ):
+        if prop in ignoredProperties or not obj.Document:
+            return
+        self.setChanged(obj)
+        if prop in structureProperties:
+            self.structure[obj.Document.Name] = self.sequence
+
+    def slotCreatedObject( self, obj ):
+        self.slotStructure(obj)
+
+    def slotDeletedObject( self, obj ):
+        self.slotStructure(obj)
+
+    def slotStructure( self, obj ):
+        if obj.Document:
+            self.setChanged(obj)
+            self.structure[obj.Document.Name] = self.sequence
+
+    def setChanged( self, obj ):
+        self.sequence += 1
+        docName = obj.Document.Name
+        self.changed.setdefault( docName, {} )[obj.Name] = self.sequence
+        self.lastChange[docName] = self.sequence
+
+    def slotDeletedDocument( self, doc ):
+        for data in ( self.solved, self.graphs, self.changed, self.lastChange, self.structure ):
+            data.pop( doc.Name, None )
+
+
+    # whether the document has already been solved while we were watching
+    def hasBaseline( self, doc ):
+        return doc.Name in self.solved
+
+    def setBaseline( self, doc ):
+        self.solved[doc.Name] = self.sequence
+        # its objects are up to date
+        self.changed.pop( doc.Name, None )
+
+
+    # nodes of the document changed since its last solve
+    def changedNodes( self, doc ):
+        since = self.solved.get(doc.Name, -1)
+        changed = self.changed.get( doc.Name, {} )
+        return set( [ (doc.Name, objName) for objName, seq in changed.items() if seq > since ] )
+
+
+    # names of the other documents changed since the last solve of the document
+    def changedDocuments( self, doc ):
+        since = self.solved.get(doc.Name, -1)
+        return set( [ d for d, seq in self.lastChange.items() if seq > since and d != doc.Name ] )
+
+
+    # the graph of the document, rebuilt only if its structure has changed
+    def getGraph( self, doc ):
+        built, graph = self.graphs.get( doc.Name, (-1, None) )
+        if graph is None or self.structure.get(doc.Name, 0) > built:
+            graph = AttachmentGraph(doc)
+            self.graphs[doc.Name] = ( self.sequence, graph )
+        return graph
+
+
+
+# start the change tracker (once)
+def getTracker():
+    global tracker
+    if tracker is None:
+        tracker = changeTracker()
+        App.addDocumentObserver(tracker)
+    return tracker
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                 the real stuff                |
+    +-----------------------------------------------+
+"""
+# solve the given nodes of the document, level after level. The Placements
+# given by known Asm4 expressions are computed together by placementLib,
+# the other objects are recomputed one by one by FreeCAD
+def solveNodes( doc, graph, nodes ):
+    ordered = [ n for n in graph.sortNodes(nodes) if n[0] == doc.Name ]
+    known = {}
+    recomputed = []
+    for level in graph.levels(ordered):
+        compiled = []
+        chains = []
+        others = []
+        for ( docName, objName ) in level:
+            obj = doc.getObject(objName)
+            if not obj:
+                continue
+            chain = placementLib.compileExpression( placementExpression(obj) )
+            if chain:
+                compiled.append(obj)
+                chains.append(chain)
+            else:
+                others.append(obj)
+        if compiled:
+            try:
+                start = time.perf_counter()
+                mats = placementLib.evaluateChains( doc, compiled, chains, known )
+                placementLib.writePlacements( compiled, mats )
+                profilerLib.recordExpressions( compiled, time.perf_counter() - start )
+                for obj, mat in zip( compiled, mats ):
+                    known[ (doc.Name, obj.Name) ] = mat
+            except Exception as err:
+                # let FreeCAD deal with it
+                FCC.PrintWarning( 'Batch placement evaluation failed: '+str(err)+'\n' )
+                others.extend(compiled)
+        for obj in others:
+            profilerLib.recompute( obj )
+            known.pop( (doc.Name, obj.Name), None )
+        recomputed.extend( compiled + others )
+    return recomputed
+
+
+# recompute every App::Part of the document, after having solved all the
+# objects placed by an expression
+def fullUpdate( doc, graph ):
+    placed = [ n for n in graph.nodes if graph.upstream.get(n) ]
+    recomputed = solveNodes( doc, graph, placed )
+    for obj in doc.Objects:
+        if obj.TypeId == 'App::Part':
+            profilerLib.recompute( obj, 'True' )
+            recomputed.append(obj)
+    return recomputed
+
+
+# what to update in the document after changes in other documents: the
+# objects of these documents it depends on, and the links pointing to them,
+# which are placed by an LCS that can depend on anything in its part
+def externalChanges( doc, graph, changedDocs ):
+    nodes = set( [ dep for dep in graph.downstream if dep[0] in changedDocs ] )
+    for link in cacheLib.links.linksToDocuments( changedDocs, doc ):
+        node = ( doc.Name, link.Name )
+        nodes.add( node )
+        nodes.update( [ dep for dep in graph.upstream.get(node, ()) if dep[0] != doc.Name ] )
+    return nodes
+
+
+# recompute only the objects changed since the last solve, and those
+# downstream, and what depends on the other documents changed since
+def incrementalUpdate( doc, graph, changed, changedDocs=() ):
+    changed = set(changed)
+    if changedDocs:
+        changed.update( externalChanges( doc, graph, changedDocs ) )
+    # objects from other documents (LCS in linked parts) that need an update
+    # first, with what they depend on in their document
+    for ( docName, objName ) in changed:
+        if docName != doc.Name:
+            extDoc = App.listDocuments().get(docName)
+            extObj = extDoc.getObject(objName) if extDoc else None
+            if extObj:
+                profilerLib.recompute( extObj, True )
+    affected = graph.downstreamOf(changed)
+    affected.update( [ n for n in changed if n[0] == doc.Name ] )
+    return solveNodes( doc, graph, affected )
+
+
+# problems in the attachments of the document, that would make a recompute fail
+def checkAssembly( doc ):
+    return getTracker().getGraph(doc).check()
+
+
+# attachments of the document that couldn't be checked
+def assemblyWarnings( doc ):
+    graph = getTracker().getGraph(doc)
+    graph.check()
+    return graph.warnings
+
+
+# whether attaching the object to the target would make a circular attachment
+def makesLoop( obj, target ):
+    graph = getTracker().getGraph(obj.Document)
+    targetNode = ( target.Document.Name, target.Name )
+    objNode = ( obj.Document.Name, obj.Name )
+    return targetNode == objNode or targetNode in graph.downstreamOf( [objNode] )
+
+
+# update the assembly in the document, incrementally if possible.
+# Returns the list of recomputed objects, or None if the assembly has
+# circular or dangling attachments, in which case nothing is recomputed
+def updateAssembly( doc, incremental=True ):
+    tracker = getTracker()
+    graph = tracker.getGraph(doc)
+    errors = graph.check()
+    if errors:
+        for error in errors:
+            FCC.PrintError( error+'\n' )
+        return None
+    for warning in graph.warnings:
+        FCC.PrintWarning( warning+'\n' )
+    if incremental and tracker.hasBaseline(doc):
+        recomputed = incrementalUpdate( doc, graph, tracker.changedNodes(doc), tracker.changedDocuments(doc) )
+    else:
+        recomputed = fullUpdate( doc, graph )
+    # what was changed by this solve is now the baseline
+    tracker.setBaseline(doc)
+    return recomputed
+
+
+# recompute only the given objects and those downstream, for example after
+# a change of their AttachmentOffset. Returns the list of recomputed
+# objects, or None if the assembly has circular or dangling attachments
+def updateObjects( doc, objects ):
+    graph = getTracker().getGraph(doc)
+    errors = graph.check()
+    if errors:
+        for error in errors:
+            FCC.PrintError( error+'\n' )
+        return None
+    return incrementalUpdate( doc, graph, set( [ (obj.Document.Name, obj.Name) for obj in objects ] ) )
@@ -0,0 +1,135 @@
+# coding: utf-8
+#
+# conftest.py
+#
+# the libraries that don't import any GUI module are tested without
+# FreeCAD: a small stand-in with only what these libraries use is installed
+# in its place. The documents and objects of the tests are small fakes too,
+# see fakeDocument and fakeObject
+
+
+
+import os, sys, math, types
+import pytest
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath(__file__) ) ) )
+
+
+
+"""
+    +-----------------------------------------------+
+    |          a stand-in for the FreeCAD module    |
+    +-----------------------------------------------+
+"""
+class Vector():
+    def __init__( self, x=0.0, y=0.0, z=0.0 ):
+        ( self.x, self.y, self.z ) = ( float(x), float(y), float(z) )
+
+
+# only the quaternion ( x, y, z, w ) is kept, from itself or from an
+# axis and an angle in degrees
+class Rotation():
+    def __init__( self, x=0.0, y=0.0, z=0.0, w=1.0 ):
+        if isinstance( x, Vector ):
+            ( axis, angle ) = ( x, math.radians(y) / 2 )
+            ( x, y, z, w ) = ( axis.x * math.sin(angle), axis.y * math.sin(angle), \
+                               axis.z * math.sin(angle), math.cos(angle) )
+        norm = ( x*x + y*y + z*z + w*w ) ** 0.5
+        self.Q = ( x/norm, y/norm, z/norm, w/norm )
+
+
+class Placement():
+    def __init__( self, base=None, rotation=None ):
+        self.Base = base or Vector()
+        self.Rotation = rotation or Rotation()
+
+
+class Console():
+    def PrintMessage( text ):
+        pass
+    PrintWarning = PrintError = PrintLog = PrintMessage
+
+
+def installFreeCAD():
+    module = types.ModuleType('FreeCAD')
+    module.Vector = Vector
+    module.Rotation = Rotation
+    module.Placement = Placement
+    module.Console = Console
+    module.GuiUp = False
+    module.ActiveDocument = None
+    # docName -> document, set by the tests
+    module.documents = {}
+    module.listDocuments = lambda: module.documents
+    module.addDocumentObserver = lambda observer: None
+    module.removeDocumentObserver = lambda observer: None
+    sys.modules['FreeCAD'] = module
+
+
+installFreeCAD()
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |              fake documents and objects       |
+    +-----------------------------------------------+
+"""
+class fakeDocument():
+    def __init__( self, name ):
+        self.Name = name
+        self.Objects = []
+
+    def getObject( self, name ):
+        for obj in self.Objects:
+            if obj.Name == name:
+                return obj
+        return None
+
+
+# an object of a document: its children are the objects of its Group,
+# and link is the object it links to, if any
+class fakeObject():
+    def __init__( self, doc, name, typeId='App::FeaturePython', children=(), link=None, **props ):
+        self.Document = doc
+        self.Name = name
+        self.Label = name
+        self.Label2 = ''
+        self.TypeId = typeId
+        self.children = list(children)
+        self.link = link
+        self.ExpressionEngine = []
+        self.Placement = Placement()
+        for ( prop, value ) in props.items():
+            setattr( self, prop, value )
+        doc.Objects.append( self )
+
+    def getLinkedObject( self, recursive=True ):
+        return self.link or self
+
+    def getSubObjects( self, reason=0 ):
+        return [ child.Name+'.' for child in self.children ]
+
+    def isDerivedFrom( self, typeId ):
+        return self.TypeId == typeId
+
+    def setExpression( self, path, expr ):
+        self.ExpressionEngine.append( ( path, expr ) )
+
+
+@pytest.fixture
+def documents():
+    import FreeCAD
+    import cacheLib
+    saved = dict( FreeCAD.listDocuments() )
+    FreeCAD.listDocuments().clear()
+    def addDocument( name ):
+        doc = fakeDocument( name )
+        FreeCAD.listDocuments()[name] = doc
+        return doc
+    yield addDocument
+    for doc in list( FreeCAD.listDocuments().values() ):
+        cacheLib.watch().slotDeletedDocument( doc )
+    FreeCAD.listDocuments().clear()
+    FreeCAD.listDocuments().update( saved )
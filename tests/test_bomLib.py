@@ -0,0 +1,126 @@
+# coding: utf-8
+#
+# test_bomLib.py
+#
+# the quantities of the Bill Of Materials, and the comparison of two BOMs
+
+
+
+import bomLib
+from conftest import fakeObject
+
+
+
+class fakeBoundBox():
+    ( XLength, YLength, ZLength ) = ( 10.0, 20.0, 30.0 )
+
+    def isValid( self ):
+        return True
+
+
+class fakeShape():
+    BoundBox = fakeBoundBox()
+    Volume = 6000.0
+
+    def isNull( self ):
+        return False
+
+    def hashCode( self ):
+        return id(self)
+
+
+# Model: 3 links to a sub-assembly, a link to the screw in a group, and the
+# Variables. The sub-assembly has 4 links to the screw and an LCS
+def makeModel( documents, subLinks=3 ):
+    asm = documents( 'asm' )
+    lib = documents( 'lib' )
+    screw = fakeObject( lib, 'Screw', 'Part::Feature', Shape=fakeShape() )
+    nut = fakeObject( lib, 'Nut', 'Part::Feature', Shape=fakeShape() )
+    sub = fakeObject( lib, 'Sub', 'App::Part', \
+                      [ fakeObject( lib, 'S_'+str(i), 'App::Link', link=screw ) for i in range(4) ] + \
+                      [ fakeObject( lib, 'LCS_0', 'PartDesign::CoordinateSystem' ) ] )
+    group = fakeObject( asm, 'Group', 'App::DocumentObjectGroup', \
+                        [ fakeObject( asm, 'Screw_0', 'App::Link', link=screw ) ] )
+    links = [ fakeObject( asm, 'Sub_'+str(i), 'App::Link', link=sub ) for i in range(subLinks) ]
+    model = fakeObject( asm, 'Model', 'App::Part', links + [ group, fakeObject( asm, 'Variables' ) ] )
+    return ( model, sub, screw, nut )
+
+
+def quantities( bom, assemblies=False ):
+    return [ ( row['name'], row['total'] ) for row in bom.flatRows( assemblies ) ]
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                   quantities                  |
+    +-----------------------------------------------+
+"""
+def test_totals( documents ):
+    ( model, sub, screw, nut ) = makeModel( documents )
+    bom = bomLib.bomTable( model, volumes=False )
+    assert bom.children[ ('asm','Model') ] == { ('lib','Sub'): 3, ('lib','Screw'): 1 }
+    assert bom.children[ ('lib','Sub') ] == { ('lib','Screw'): 4 }
+    assert bom.totals() == { ('asm','Model'): 1, ('lib','Sub'): 3, ('lib','Screw'): 13 }
+
+
+def test_flatRows( documents ):
+    ( model, sub, screw, nut ) = makeModel( documents )
+    bom = bomLib.bomTable( model, volumes=False )
+    assert quantities( bom ) == [ ( 'Screw', 13 ) ]
+    assert sorted( quantities( bom, assemblies=True ) ) == [ ( 'Screw', 13 ), ( 'Sub', 3 ) ]
+
+
+def test_treeRows( documents ):
+    ( model, sub, screw, nut ) = makeModel( documents )
+    bom = bomLib.bomTable( model, volumes=False )
+    rows = [ ( row['level'], row['name'], row['quantity'], row['total'] ) for row in bom.treeRows() ]
+    assert rows == [ ( 0, 'Model', 1, 1 ), ( 1, 'Sub', 3, 3 ), ( 2, 'Screw', 4, 12 ), ( 1, 'Screw', 1, 1 ) ]
+
+
+def test_geometry( documents ):
+    ( model, sub, screw, nut ) = makeModel( documents )
+    bom = bomLib.bomTable( model )
+    row = bom.parts[ ('lib','Screw') ]
+    assert ( row['xLength'], row['yLength'], row['zLength'], row['volume'] ) == ( 10.0, 20.0, 30.0, 6000.0 )
+    assert not bom.staleMass
+    # the mass properties are left for later
+    bom = bomLib.bomTable( model, volumes=False )
+    assert bom.parts[ ('lib','Screw') ]['volume'] == ''
+    assert ('lib','Screw') in bom.staleMass
+
+
+def test_accept( documents ):
+    ( model, sub, screw, nut ) = makeModel( documents )
+    bom = bomLib.bomTable( model, volumes=False, accept=lambda obj: obj.Name != 'Sub_0' )
+    assert quantities( bom ) == [ ( 'Screw', 9 ) ]
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                   comparison                  |
+    +-----------------------------------------------+
+"""
+def test_diffRows( documents ):
+    ( model, sub, screw, nut ) = makeModel( documents )
+    before = bomLib.keyedRows( bomLib.bomTable( model, volumes=False ) )
+    # one sub-assembly less, and a nut instead of the screw of the group
+    del model.children[0]
+    model.Document.getObject( 'Screw_0' ).link = nut
+    after = bomLib.keyedRows( bomLib.bomTable( model, volumes=False ) )
+    diff = sorted( bomLib.diffRows( before, after ), key=lambda d: d['name'] )
+    assert [ ( d['change'], d['document'], d['name'], d['before'], d['after'] ) for d in diff ] == \
+           [ ( 'added',   'lib', 'Nut',   0,  1 ), \
+             ( 'changed', 'lib', 'Screw', 13, 8 ), \
+             ( 'changed', 'lib', 'Sub',   3,  2 ) ]
+
+
+def test_diffRows_same( documents ):
+    ( model, sub, screw, nut ) = makeModel( documents )
+    before = bomLib.keyedRows( bomLib.bomTable( model, volumes=False ) )
+    after = bomLib.keyedRows( bomLib.bomTable( model, volumes=False ) )
+    assert bomLib.diffRows( before, after ) == []
+    assert bomLib.diffRows( before, {} )[0]['change'] == 'removed'
@@ -0,0 +1,120 @@
+# coding: utf-8
+#
+# test_placementLib.py
+#
+# the conversions between Placements and 4x4 matrices, and the evaluation
+# of compiled Placement expressions, against plain NumPy products
+
+
+
+import numpy as np
+
+import FreeCAD as App
+
+import placementLib
+from conftest import fakeObject
+
+
+
+def randomArray( count, seed=0 ):
+    generator = np.random.default_rng( seed )
+    data = np.empty( (count, 7) )
+    data[:,0:3] = generator.uniform( -100, 100, (count, 3) )
+    q = generator.normal( size=(count, 4) )
+    data[:,3:7] = q / np.linalg.norm( q, axis=1 )[:,None]
+    return data
+
+
+def makePlacement( row ):
+    return App.Placement( App.Vector( *row[0:3] ), App.Rotation( *row[3:7] ) )
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |               compiled expressions            |
+    +-----------------------------------------------+
+"""
+def test_compileExpression():
+    expr = 'LCS_0.Placement * AttachmentOffset * Part#LCS_1.Placement ^ -1'
+    assert placementLib.compileExpression( expr ) == \
+           ( ( None, 'LCS_0', False ), ( None, None, False ), ( 'Part', 'LCS_1', True ) )
+    # compiled once
+    assert placementLib.compileExpression( expr ) is placementLib.compileExpression( expr )
+
+
+def test_compileExpression_other():
+    assert placementLib.compileExpression( '' ) is None
+    assert placementLib.compileExpression( 'LCS_0.Placement * Box.Shape' ) is None
+    assert placementLib.compileExpression( 'create(<<placement>>; LCS_0.Base)' ) is None
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                  conversions                  |
+    +-----------------------------------------------+
+"""
+def test_round_trip():
+    data = randomArray( 50 )
+    mats = placementLib.arrayToMatrices( data )
+    # rotation matrices
+    rot = mats[:,0:3,0:3]
+    assert np.allclose( np.matmul( rot, np.transpose( rot, (0,2,1) ) ), np.eye(3) )
+    assert np.allclose( np.linalg.det( rot ), 1.0 )
+    # q and -q are the same rotation
+    back = placementLib.matricesToArray( mats )
+    assert np.allclose( back[:,0:3], data[:,0:3] )
+    sign = np.sign( np.sum( back[:,3:7] * data[:,3:7], axis=1 ) )
+    assert np.allclose( back[:,3:7] * sign[:,None], data[:,3:7] )
+
+
+def test_placements_round_trip():
+    data = randomArray( 10, seed=1 )
+    placements = placementLib.arrayToPlacements( data )
+    assert np.allclose( placementLib.placementsToArray( placements ), data )
+
+
+def test_invertMatrices():
+    mats = placementLib.arrayToMatrices( randomArray( 20, seed=2 ) )
+    inv = placementLib.invertMatrices( mats )
+    assert np.allclose( np.matmul( mats, inv ), np.eye(4) )
+    assert np.allclose( inv, np.linalg.inv( mats ) )
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                 evaluated chains              |
+    +-----------------------------------------------+
+"""
+def test_evaluateChains( documents ):
+    asm = documents( 'asm' )
+    part = documents( 'part' )
+    data = randomArray( 5, seed=3 )
+    ( lcs0, lcs1, offset0, offset1, parent ) = [ makePlacement(row) for row in data ]
+    fakeObject( asm, 'LCS_0', Placement=lcs0 )
+    fakeObject( asm, 'Parent', Placement=parent )
+    fakeObject( part, 'LCS_1', Placement=lcs1 )
+    link0 = fakeObject( asm, 'Link_0', AttachmentOffset=offset0 )
+    link1 = fakeObject( asm, 'Link_1', AttachmentOffset=offset1 )
+    chains = [ placementLib.compileExpression( 'LCS_0.Placement * AttachmentOffset * part#LCS_1.Placement ^ -1' ), \
+               placementLib.compileExpression( 'Parent.Placement * part#LCS_1.Placement * AttachmentOffset * part#LCS_1.Placement ^ -1' ) ]
+    result = placementLib.evaluateChains( asm, [ link0, link1 ], chains, {} )
+    ( lcs0, lcs1, offset0, offset1, parent ) = placementLib.arrayToMatrices( data )
+    inv1 = np.linalg.inv( lcs1 )
+    assert np.allclose( result[0], lcs0 @ offset0 @ inv1 )
+    assert np.allclose( result[1], parent @ lcs1 @ offset1 @ inv1 )
+
+
+def test_evaluateChains_known( documents ):
+    asm = documents( 'asm' )
+    link = fakeObject( asm, 'Link', AttachmentOffset=App.Placement() )
+    mat = placementLib.arrayToMatrices( randomArray( 1, seed=4 ) )[0]
+    # LCS_0 isn't in the document, it's read from the known Placements
+    chains = [ placementLib.compileExpression( 'LCS_0.Placement * AttachmentOffset' ) ]
+    result = placementLib.evaluateChains( asm, [ link ], chains, { ('asm','LCS_0'): mat } )
+    assert np.allclose( result[0], mat )
@@ -0,0 +1,117 @@
+# coding: utf-8
+#
+# test_solverLib.py
+#
+# the attachment graph of a document: the order in which the objects are
+# solved, and the problems found before any recompute
+
+
+
+import solverLib
+from conftest import fakeObject
+
+
+
+def attach( obj, expr ):
+    obj.setExpression( 'Placement', expr )
+    return obj
+
+
+def makeAssembly( documents ):
+    asm = documents( 'asm' )
+    part = documents( 'part' )
+    fakeObject( part, 'LCS_1' )
+    fakeObject( asm, 'LCS_0' )
+    # listed before the link it's attached to
+    attach( fakeObject( asm, 'Link_2' ), 'Link_1.Placement * part#LCS_1.Placement * AttachmentOffset * part#LCS_1.Placement ^ -1' )
+    attach( fakeObject( asm, 'Link_1' ), 'LCS_0.Placement * AttachmentOffset * part#LCS_1.Placement ^ -1' )
+    return asm
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                  dependencies                 |
+    +-----------------------------------------------+
+"""
+def test_dependencies( documents ):
+    asm = makeAssembly( documents )
+    graph = solverLib.AttachmentGraph( asm )
+    assert graph.upstream[ ('asm','Link_1') ] == { ('asm','LCS_0'), ('part','LCS_1') }
+    assert graph.upstream[ ('asm','LCS_0') ] == set()
+    assert graph.downstreamOf( [ ('part','LCS_1') ] ) == { ('asm','Link_1'), ('asm','Link_2') }
+    assert graph.downstreamOf( [ ('asm','Link_1') ] ) == { ('asm','Link_2') }
+
+
+def test_order( documents ):
+    asm = makeAssembly( documents )
+    graph = solverLib.AttachmentGraph( asm )
+    ordered = graph.sortNodes( graph.nodes )
+    assert ordered == [ ('asm','LCS_0'), ('asm','Link_1'), ('asm','Link_2') ]
+    assert graph.levels( ordered ) == [ [ ('asm','LCS_0') ], [ ('asm','Link_1') ], [ ('asm','Link_2') ] ]
+
+
+def test_order_subset( documents ):
+    asm = makeAssembly( documents )
+    graph = solverLib.AttachmentGraph( asm )
+    nodes = graph.downstreamOf( [ ('part','LCS_1') ] )
+    assert graph.sortNodes( nodes ) == [ ('asm','Link_1'), ('asm','Link_2') ]
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |                    problems                   |
+    +-----------------------------------------------+
+"""
+def test_no_problems( documents ):
+    asm = makeAssembly( documents )
+    graph = solverLib.AttachmentGraph( asm )
+    assert graph.findLoops() == []
+    assert graph.findDangling() == ( [], [] )
+    assert graph.check() == []
+    assert graph.warnings == []
+
+
+def test_loops( documents ):
+    asm = documents( 'asm' )
+    fakeObject( asm, 'LCS_0' )
+    attach( fakeObject( asm, 'A' ), 'B.Placement * AttachmentOffset' )
+    attach( fakeObject( asm, 'B' ), 'C.Placement * AttachmentOffset' )
+    attach( fakeObject( asm, 'C' ), 'A.Placement * AttachmentOffset' )
+    attach( fakeObject( asm, 'D' ), 'A.Placement * AttachmentOffset' )
+    graph = solverLib.AttachmentGraph( asm )
+    loops = graph.findLoops()
+    assert [ sorted(loop) for loop in loops ] == [ [ ('asm','A'), ('asm','B'), ('asm','C') ] ]
+    assert graph.check() == [ 'Circular attachment between A, B, C' ]
+    # the nodes of the loop, and those depending on them, are left for the end
+    assert graph.sortNodes( graph.nodes ) == \
+           [ ('asm','LCS_0'), ('asm','A'), ('asm','B'), ('asm','C'), ('asm','D') ]
+
+
+def test_dangling( documents ):
+    asm = documents( 'asm' )
+    attach( fakeObject( asm, 'Link_1' ), 'Missing.Placement * AttachmentOffset' )
+    attach( fakeObject( asm, 'Link_2' ), 'LCS_0.Placement * AttachmentOffset * closed#LCS_1.Placement ^ -1' )
+    fakeObject( asm, 'LCS_0' )
+    graph = solverLib.AttachmentGraph( asm )
+    ( dangling, unloaded ) = graph.findDangling()
+    assert dangling == [ ( ('asm','Link_1'), ('asm','Missing') ) ]
+    assert unloaded == [ ( ('asm','Link_2'), ('closed','LCS_1') ) ]
+    # the unloaded documents are only warnings
+    assert graph.check() == [ 'Link_1 is attached to asm#Missing, which doesn\'t exist' ]
+    assert graph.warnings == [ 'Link_2 is attached to closed#LCS_1, whose document isn\'t loaded' ]
+
+
+def test_dangling_rechecked( documents ):
+    asm = documents( 'asm' )
+    attach( fakeObject( asm, 'Link_1' ), 'AttachmentOffset * part#LCS_1.Placement ^ -1' )
+    graph = solverLib.AttachmentGraph( asm )
+    assert graph.check() == []
+    assert len( graph.warnings ) == 1
+    # the document is opened, but doesn't have the LCS
+    documents( 'part' )
+    assert graph.check() == [ 'Link_1 is attached to part#LCS_1, which doesn\'t exist' ]
+    assert graph.warnings == []
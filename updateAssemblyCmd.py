@@ -12,6 +12,7 @@ import FreeCAD as App
 import Part
 
 import libAsm4 as Asm4
+import solverLib
 
 
 
@@ -36,11 +37,12 @@ class updateAssembly:
     +-----------------------------------------------+
     """
     def Activated(self):
-        # find every Part in the document ...
-        for obj in App.ActiveDocument.Objects:
-            # ... and update it
-            if obj.TypeId == 'App::Part':
-                obj.recompute('True')
+        # the first time, every Part in the document is updated, then only
+        # the objects changed since the last solve and those attached to them
+        # circular or dangling attachments are refused before any recompute
+        if solverLib.updateAssembly( App.ActiveDocument ) is None:
+            errors = solverLib.checkAssembly( App.ActiveDocument )
+            Asm4.warningBox( 'The assembly cannot be updated :\n\n'+'\n'.join(errors) )
         #App.ActiveDocument.recompute()
 
 